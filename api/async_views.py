@@ -0,0 +1,135 @@
+"""
+Async versions of the login and registration views, served through backend/asgi.py.
+
+Password hashing and verification run on the bounded `password_hasher` pool instead of the request thread, and the
+views answer 503 as soon as the pool is saturated. The pool only ever computes hashes, it never touches the database:
+a hash that must be upgraded to the preferred hasher is saved by the view, through the async ORM. DRF views are
+synchronous, so these are plain Django views that mirror the request and response format of `UserCreateView` and
+`UserLoginView`.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.http import JsonResponse
+from .hashing import HasherSaturated, password_hasher
+from .models import WorkoutPlan
+from .serializers import UserSerializer
+from .tokens import issue_access_token
+from .views import create_person
+import json
+
+def _request_data(request):
+    """
+    Returns the JSON or form body of a request.
+    """
+    if request.content_type == 'application/json':
+        try:
+            return json.loads(request.body or b'{}')
+        except ValueError:
+            return None
+
+    return request.POST
+
+def _busy_response():
+    response = JsonResponse({'error': 'Server is busy, try again later'}, status=503)
+    response['Retry-After'] = '1'
+    return response
+
+def _verify_password(password, encoded):
+    """
+    Checks a password against its hash like `User.check_password`, without its setter saving the user.
+
+    Returns:
+        tuple: Whether the password matches, and whether its hash must be upgraded to the preferred hasher.
+    """
+    must_update = []
+    matches = check_password(password, encoded, setter=lambda password: must_update.append(True))
+    return matches, bool(must_update)
+
+@transaction.atomic
+def _save_user(serializer, password):
+    user = serializer.save(password=password)
+    create_person(user)
+
+async def async_user_create(request):
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+    data = _request_data(request)
+    if not isinstance(data, dict):
+        return JsonResponse({'error': 'Malformed request body'}, status=400)
+
+    serializer = UserSerializer(data=data)
+    if not await sync_to_async(serializer.is_valid)():
+        return JsonResponse(serializer.errors, status=400)
+
+    password = data.get('password')
+    if not password:
+        return JsonResponse({'error': 'Password not provided'}, status=400)
+
+    try:
+        password = await password_hasher.run(make_password, password)
+    except HasherSaturated:
+        return _busy_response()
+
+    await sync_to_async(_save_user)(serializer, password)
+
+    return JsonResponse({'success': True}, status=201)
+
+async def async_user_login(request):
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+    data = _request_data(request)
+    if not isinstance(data, dict):
+        return JsonResponse({'error': 'Malformed request body'}, status=400)
+
+    username = data.get('username')
+    if not username:
+        return JsonResponse({'error': 'Username not provided'}, status=400)
+
+    password = data.get('password')
+    if not password:
+        return JsonResponse({'error': 'Password not provided'}, status=400)
+
+    user = await User.objects.select_related('person').filter(username=username).afirst()
+
+    must_update = False
+    try:
+        if user is None or not user.is_active:
+            # hash anyway, like ModelBackend, so unknown usernames take as long as wrong passwords
+            await password_hasher.run(make_password, password)
+            user = None
+        else:
+            matches, must_update = await password_hasher.run(_verify_password, password, user.password)
+            if not matches:
+                user = None
+    except HasherSaturated:
+        return _busy_response()
+
+    if user is None:
+        return JsonResponse({'error': ['Invalid username or password', 'Registration needed']}, status=400)
+
+    if must_update:
+        try:
+            user.password = await password_hasher.run(make_password, password)
+            await user.asave(update_fields=['password'])
+        except HasherSaturated:
+            # the login stands, the hash is upgraded by a later one
+            pass
+
+    has_workout_plans = await WorkoutPlan.objects.filter(person=user.person.id).aexists()
+
+    return JsonResponse({
+        'success': True,
+        'userHashedId': user.person.hashed_id,
+        'accessToken': issue_access_token(user.person),
+        'accessTokenExpiresIn': settings.ACCESS_TOKEN_MAX_AGE,
+        'hasWorkoutPlans': has_workout_plans,
+    }, status=200)
+
+# the views authenticate through the request body like the DRF views, which are exempt from CSRF checks as well
+async_user_create.csrf_exempt = True
+async_user_login.csrf_exempt = True
@@ -0,0 +1,170 @@
+from collections import OrderedDict
+from django.conf import settings
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication
+from .models import Person
+from .tokens import is_access_token, read_access_token
+import copy
+import threading
+import time
+
+def _copy_person(person):
+    person = copy.copy(person)
+    person.user = copy.copy(person.user)
+    return person
+
+class IdentityCache():
+    """
+    A least recently used cache of resolved persons, with their users, keyed by hashed id.
+
+    Entries expire `ttl` seconds after they were stored and are dropped by `invalidate` whenever a view changes the
+    person. Every lookup is handed its own copy of the cached person and of its user, so views can modify them freely.
+
+    Entries live in the memory of one process, and `invalidate` only drops the entry of the process it runs in.
+    Other processes may serve a person changed elsewhere for up to `ttl` seconds, so views that depend on the
+    attributes of the person re-read them, see `create_workout_plan`.
+
+    Attributes:
+        max_size (int): The number of persons kept before the least recently used one is evicted.
+        ttl (float): The number of seconds an entry stays valid.
+        hits (int): The number of lookups served from the cache.
+        misses (int): The number of lookups that had to query the database.
+
+    Methods:
+        get: Returns the person of a hashed id, querying and storing it on a miss.
+        invalidate: Drops the entry of a hashed id.
+        clear: Drops every entry.
+        stats: Returns the size and hit/miss counters of the cache.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, hashed_id):
+        """
+        Returns the person of a hashed id.
+
+        Args:
+            hashed_id (str): The hashed id of the person.
+
+        Returns:
+            Person: A copy of the person with its user loaded, None if no person has the hashed id.
+        """
+        with self._lock:
+            entry = self._entries.get(hashed_id)
+            if entry is not None and entry[1] > time.monotonic():
+                self._entries.move_to_end(hashed_id)
+                self.hits += 1
+                return _copy_person(entry[0])
+
+            self.misses += 1
+
+        person = Person.objects.select_related('user').filter(hashed_id=hashed_id).first()
+        if not person:
+            return None
+
+        with self._lock:
+            self._entries[hashed_id] = (person, time.monotonic() + self.ttl)
+            self._entries.move_to_end(hashed_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+        return _copy_person(person)
+
+    def invalidate(self, hashed_id):
+        with self._lock:
+            self._entries.pop(hashed_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+identity_cache = IdentityCache(
+    max_size=getattr(settings, 'IDENTITY_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'IDENTITY_CACHE_TTL', 300))
+
+def get_hashed_id(request):
+    """
+    Returns the hashed id, or the access token, identifying the user of a request.
+
+    The id is read from the `hashed_id` URL argument of the GET views, the `X-User-Id` field of the request body,
+    the `X-User-Id` header or a `Bearer` Authorization header, in that order.
+
+    Args:
+        request (Request): The DRF request.
+
+    Returns:
+        str: The hashed id or access token, None if the request does not provide one.
+    """
+    hashed_id = request.parser_context.get('kwargs', {}).get('hashed_id')
+    if hashed_id:
+        return hashed_id
+
+    if hasattr(request.data, 'get'):
+        hashed_id = request.data.get('X-User-Id')
+        if hashed_id:
+            return hashed_id
+
+    hashed_id = request.META.get('HTTP_X_USER_ID')
+    if hashed_id:
+        return hashed_id
+
+    return get_bearer_token(request)
+
+def get_bearer_token(request):
+    """
+    Returns the access token of the `Bearer` Authorization header of a request, None if it has none.
+    """
+    authorization = request.META.get('HTTP_AUTHORIZATION', '').split()
+    if len(authorization) == 2 and authorization[0] == 'Bearer':
+        return authorization[1]
+
+    return None
+
+class HashedIdAuthentication(BaseAuthentication):
+    """
+    Resolves the person identified by the hashed id of a request, once per request, through the identity cache.
+
+    An access token can be given in place of the hashed id, it is checked in memory and rejected with a 401 if it is
+    invalid or expired. Once ACCESS_TOKEN_REQUIRED is set a bare hashed id is no longer enough: it only names the
+    person, and the request must also carry a `Bearer` access token issued for that person.
+
+    The resolved `Person` is attached to the request as `request.person`, with its user already loaded, or None if
+    the request has no hashed id or no person has it. Requests without a hashed id fall through to the next
+    authentication class.
+    """
+
+    def authenticate(self, request):
+        request.person = None
+
+        hashed_id = get_hashed_id(request)
+        if not hashed_id:
+            return None
+
+        if is_access_token(hashed_id):
+            hashed_id = read_access_token(hashed_id)
+            if not hashed_id:
+                raise exceptions.AuthenticationFailed('Access token is invalid or expired')
+
+        elif getattr(settings, 'ACCESS_TOKEN_REQUIRED', False):
+            token = get_bearer_token(request)
+            if not token or read_access_token(token) != hashed_id:
+                raise exceptions.AuthenticationFailed('Access token is required')
+
+        request.person = identity_cache.get(hashed_id)
+        if not request.person:
+            return None
+
+        return (request.person.user, None)
+
+    def authenticate_header(self, request):
+        return 'Bearer'
@@ -0,0 +1,170 @@
+"""
+Generates the workout plans of a whole cohort of people at once.
+
+The exercise selection of every plan is spread across a process pool, then the plans are inserted in large
+batched transactions, one bulk insert per table and chunk of people.
+"""
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from django.db import transaction
+from .catalog import load_exercise_definitions
+from .models import Day, Exercise, Person, Week, WorkoutPlan
+from .numbering import allocate_plan_numbers
+from .response_cache import plan_responses
+from .skeletons import count_skeleton_exercises
+from .snapshots import write_plan_snapshots
+from .sync import next_change_seqs
+from .utils import Workout
+import django
+
+def select_cohort_skeleton(preferred_days, num_weeks):
+    """
+    Selects the skeleton of one plan, run inside the process pool.
+
+    Args:
+        preferred_days (list of str): The preferred workout days of the person.
+        num_weeks (int): The number of weeks of the workout plan.
+
+    Returns:
+        tuple: The plan skeleton, or None if a preferred day is not a day of the week.
+    """
+    try:
+        return Workout()._select_plan_skeleton(preferred_days, num_weeks)
+    except ValueError:
+        return None
+
+def _plan_parameters(workout, person, preferred_days):
+    """
+    Determines the sets, reps and number of weeks of a member's plan.
+
+    Returns:
+        tuple: The sets, reps and number of weeks, or a string describing why they could not be determined.
+    """
+    if not preferred_days or not isinstance(preferred_days, list):
+        return "Preferred days list is missing"
+
+    try:
+        sets, reps = workout._determine_sets_and_reps(person, workout._calculate_bmi(person))
+    except (ArithmeticError, NameError):
+        # the person has not provided their gender or biometrics yet
+        return "Sets and reps could not be determined"
+
+    return sets, reps, workout._determine_num_weeks(preferred_days)
+
+def _insert_cohort_chunk(workout, members, definitions):
+    """
+    Inserts the plans of a chunk of members in one transaction.
+
+    Args:
+        workout (Workout): The workout planner used to build the plan trees.
+        members (list of dict): The members whose plan parameters and skeleton have been determined.
+        definitions (dict): The `ExerciseDefinition` of every catalog exercise keyed by name.
+    """
+    with transaction.atomic():
+        next_numbers = allocate_plan_numbers(Counter(member['person'].id for member in members))
+        change_seqs = next_change_seqs(member['person'].id for member in members)
+
+        workout_plans = []
+        for member in members:
+            person_id = member['person'].id
+            number = next_numbers[person_id]
+            next_numbers[person_id] += 1
+
+            member['workout_plan'] = WorkoutPlan(
+                person=member['person'],
+                name=f"{len(member['preferred_days'])}/{member['num_weeks']} CHALLENGE",
+                number=number,
+                total_exercises=count_skeleton_exercises(member['skeleton']),
+                change_seq=change_seqs[person_id])
+            workout_plans.append(member['workout_plan'])
+
+        WorkoutPlan.objects.bulk_create(workout_plans)
+
+        weeks, days, exercises = [], [], []
+        for member in members:
+            plan_tree = workout._build_plan_tree(
+                member['workout_plan'], member['skeleton'], member['sets'], member['reps'], definitions,
+                change_seqs[member['person'].id])
+            weeks += plan_tree[0]
+            days += plan_tree[1]
+            exercises += plan_tree[2]
+
+        Week.objects.bulk_create(weeks)
+        Day.objects.bulk_create(days)
+        Exercise.objects.bulk_create(exercises)
+        write_plan_snapshots([workout_plan.id for workout_plan in workout_plans])
+        plan_responses.invalidate_on_commit(workout_plan.id for workout_plan in workout_plans)
+
+def generate_cohort_plans(entries, processes=None, chunk_size=500):
+    """
+    Generates a workout plan for every (hashed_id, preferred_days) pair.
+
+    Args:
+        entries (list of tuple): The hashed id and preferred workout days of every member.
+        processes (int, optional): The size of the process pool selecting the exercises. The selection runs in the
+            calling process when it is None or 1.
+        chunk_size (int, optional): The number of plans inserted per transaction. Defaults to 500.
+
+    Returns:
+        list of dict: One report per entry, in order, holding the hashed id, whether its plan was created and
+        either the id of the plan or the reason it was not created.
+    """
+    workout = Workout()
+    reports = [{'hashedId': hashed_id, 'success': False} for hashed_id, preferred_days in entries]
+
+    hashed_ids = {hashed_id for hashed_id, preferred_days in entries}
+    persons = {person.hashed_id: person for person in Person.objects.filter(hashed_id__in=hashed_ids)}
+
+    members = []
+    for report, (hashed_id, preferred_days) in zip(reports, entries):
+        person = persons.get(hashed_id)
+        if not person:
+            report['error'] = 'User not found'
+            continue
+
+        parameters = _plan_parameters(workout, person, preferred_days)
+        if isinstance(parameters, str):
+            report['error'] = parameters
+            continue
+
+        sets, reps, num_weeks = parameters
+        members.append({
+            'report': report,
+            'person': person,
+            'preferred_days': preferred_days,
+            'sets': sets,
+            'reps': reps,
+            'num_weeks': num_weeks,
+        })
+
+    skeleton_arguments = ([member['preferred_days'] for member in members], [member['num_weeks'] for member in members])
+    if processes and processes > 1:
+        with ProcessPoolExecutor(max_workers=processes, initializer=django.setup) as executor:
+            skeletons = list(executor.map(select_cohort_skeleton, *skeleton_arguments, chunksize=64))
+    else:
+        skeletons = list(map(select_cohort_skeleton, *skeleton_arguments))
+
+    selected_members = []
+    for member, skeleton in zip(members, skeletons):
+        if skeleton is None:
+            member['report']['error'] = 'Preferred days are invalid'
+            continue
+
+        member['skeleton'] = skeleton
+        selected_members.append(member)
+
+    definitions = load_exercise_definitions()
+    for start in range(0, len(selected_members), chunk_size):
+        chunk = selected_members[start:start + chunk_size]
+        try:
+            _insert_cohort_chunk(workout, chunk, definitions)
+        except Exception as error:
+            for member in chunk:
+                member['report']['error'] = f'Workout Plan Not Created: {error}'
+            continue
+
+        for member in chunk:
+            member['report']['success'] = True
+            member['report']['workoutPlanId'] = member['workout_plan'].id
+
+    return reports
@@ -0,0 +1,41 @@
+"""
+Conditional GET support for the workout plan listing endpoints.
+
+Every `WorkoutPlan` carries a version that write endpoints increment, so the ETag of a listing can be computed from
+the version of the plans it shows, before anything is serialized. A request whose If-None-Match holds the current
+ETag is answered with 304 Not Modified and an empty body.
+"""
+from django.db.models import F
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+from .models import WorkoutPlan
+import hashlib
+
+def bump_plan_versions(workout_plan_ids, change_seq):
+    """
+    Increments the version of the workout plans, invalidating their ETags, and stamps them with the change sequence
+    number of the write for api.sync.
+    """
+    WorkoutPlan.objects.filter(id__in=workout_plan_ids).update(version=F('version') + 1, change_seq=change_seq)
+
+def make_etag(request, *parts):
+    """
+    Builds a strong ETag from the parts a response depends on and the query string of the request.
+    """
+    material = repr((parts, request.META.get('QUERY_STRING', '')))
+    return f'"{hashlib.sha256(material.encode()).hexdigest()[:32]}"'
+
+def is_not_modified(request, etag):
+    """
+    Returns True if the If-None-Match header of the request matches the ETag, using the weak comparison.
+    """
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if not if_none_match:
+        return False
+
+    etags = parse_etags(if_none_match)
+    return '*' in etags or etag in (candidate.removeprefix('W/') for candidate in etags)
+
+def not_modified_response(etag):
+    return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
@@ -0,0 +1,60 @@
+"""
+Runs password hashing and verification on a dedicated, size-limited thread pool.
+
+bcrypt spends tens to hundreds of milliseconds of CPU per call and releases the GIL while doing so, so a small
+thread pool keeps it off the event loop. The pool accepts at most `max_workers + max_queue` calls at once, further
+calls fail immediately with `HasherSaturated` so the views can answer 503 instead of piling up.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+import asyncio
+import threading
+
+class HasherSaturated(Exception):
+    """
+    Raised when every worker of the password hasher is busy and its queue is full.
+    """
+
+class BoundedHasher():
+    """
+    A thread pool with a queue-depth limit for password hashing.
+
+    Attributes:
+        max_workers (int): The number of threads hashing passwords.
+        max_queue (int): The number of calls allowed to wait for a free thread.
+
+    Methods:
+        run: Runs a hashing function on the pool and awaits its result.
+    """
+
+    def __init__(self, max_workers, max_queue):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='password-hashing')
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+
+    async def run(self, func, *args):
+        """
+        Runs `func(*args)` on the pool.
+
+        Raises:
+            HasherSaturated: If the pool is running and queueing as many calls as it allows.
+
+        Returns:
+            The result of the function.
+        """
+        if not self._slots.acquire(blocking=False):
+            raise HasherSaturated()
+
+        try:
+            future = self._executor.submit(func, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+
+        future.add_done_callback(lambda future: self._slots.release())
+        return await asyncio.wrap_future(future)
+
+password_hasher = BoundedHasher(
+    max_workers=getattr(settings, 'PASSWORD_HASHING_WORKERS', 4),
+    max_queue=getattr(settings, 'PASSWORD_HASHING_QUEUE', 16))
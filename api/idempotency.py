@@ -0,0 +1,155 @@
+"""
+Replays the outcome of retried mutating requests.
+
+Mobile clients retry requests whose response they never received. A request sent with an Idempotency-Key header
+claims the key for its person by inserting an `IdempotencyKey` row before the view runs, and the response of the view
+is stored on that row, in the same transaction as the writes of the view unless the view manages its own
+transactions. A retry with the same key gets the stored response back without running the view again, and a
+duplicate arriving while the first request still runs collides on the unique (person, key) constraint and is
+answered with 409 instead of running alongside it.
+
+Keys expire after IDEMPOTENCY_KEY_TTL seconds. A key whose request died before storing a response can be claimed
+again after IDEMPOTENCY_LOCK_TIMEOUT seconds. Expired keys are deleted by the purge_idempotency_keys command.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from functools import wraps
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+from .models import IdempotencyKey
+import hashlib
+import json
+
+MAX_KEY_LENGTH = 255
+REPLAYED_HEADER = 'Idempotent-Replayed'
+
+def request_fingerprint(request):
+    """
+    Hashes the method, path and body of a request, a key may only be replayed for the request it was first used for.
+    """
+    body = json.dumps(request.data, cls=JSONEncoder, sort_keys=True, default=str)
+    return hashlib.sha256(f'{request.method} {request.path}\n{body}'.encode()).hexdigest()
+
+def _key_ttl():
+    return timedelta(seconds=getattr(settings, 'IDEMPOTENCY_KEY_TTL', 60 * 60 * 24))
+
+def _lock_timeout():
+    return timedelta(seconds=getattr(settings, 'IDEMPOTENCY_LOCK_TIMEOUT', 60 * 5))
+
+def _claim_key(person, key, fingerprint):
+    """
+    Claims an idempotency key for a request.
+
+    Returns:
+        tuple: The claimed `IdempotencyKey` and None, or None and the `IdempotencyKey` already holding the key. Both
+        are None when the key was released while it was being claimed.
+    """
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            return IdempotencyKey.objects.create(person=person, key=key, fingerprint=fingerprint, date_created=now), None
+    except IntegrityError:
+        pass
+
+    existing = IdempotencyKey.objects.filter(person=person, key=key).first()
+    if existing is None:
+        return None, None
+
+    expired = existing.date_created < now - _key_ttl()
+    abandoned = existing.status_code is None and existing.date_created < now - _lock_timeout()
+    if not expired and not abandoned:
+        return None, existing
+
+    # only one of the requests taking the key over matches the state read above
+    taken = IdempotencyKey.objects.filter(
+        id=existing.id, date_created=existing.date_created, status_code=existing.status_code
+    ).update(fingerprint=fingerprint, status_code=None, response_body='', date_created=now)
+    if not taken:
+        return None, IdempotencyKey.objects.filter(id=existing.id).first()
+
+    existing.fingerprint, existing.status_code, existing.response_body, existing.date_created = fingerprint, None, '', now
+    return existing, None
+
+def _existing_key_response(existing, fingerprint):
+    """
+    Answers a request whose idempotency key is already held by another request.
+    """
+    if existing is not None and existing.fingerprint != fingerprint:
+        return Response({'error': 'Idempotency key was used for a different request'}, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    if existing is None or existing.status_code is None:
+        return Response({'error': 'A request with this idempotency key is in progress'}, status=status.HTTP_409_CONFLICT)
+
+    return Response(json.loads(existing.response_body), status=existing.status_code, headers={REPLAYED_HEADER: 'true'})
+
+def idempotent(view_func=None, atomic=True):
+    """
+    Replays the stored response of a view when a request is retried with the same Idempotency-Key header.
+
+    Applied below `authenticate_user`, keys are scoped to `request.person`. Requests without the header run as
+    usual. Responses with a 5xx status and views raising an exception release the key so the request can be retried.
+
+    Args:
+        view_func (function): The view, when used as a bare decorator.
+        atomic (bool, optional): Whether the view runs in the transaction storing its response, so its writes and
+            the stored response are committed together. Views managing their own transactions, like the cohort view
+            committing one chunk of plans at a time, pass False and have their response stored in a transaction of
+            its own once they return. Defaults to True.
+    """
+    if view_func is None:
+        return lambda view_func: idempotent(view_func, atomic=atomic)
+
+    def store_response(claim, response):
+        if response.status_code < 500:
+            claim.status_code = response.status_code
+            claim.response_body = json.dumps(response.data, cls=JSONEncoder)
+            claim.save(update_fields=['status_code', 'response_body'])
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if key is None:
+            return view_func(request, *args, **kwargs)
+
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return Response({'error': 'Idempotency key is invalid'}, status=status.HTTP_400_BAD_REQUEST)
+
+        fingerprint = request_fingerprint(request)
+        claim, existing = _claim_key(request.person, key, fingerprint)
+        if claim is None:
+            return _existing_key_response(existing, fingerprint)
+
+        try:
+            if atomic:
+                with transaction.atomic():
+                    response = view_func(request, *args, **kwargs)
+                    store_response(claim, response)
+            else:
+                response = view_func(request, *args, **kwargs)
+        except Exception:
+            claim.delete()
+            raise
+
+        if not atomic:
+            # the writes of the view are committed, the key stays claimed even if storing the response fails
+            store_response(claim, response)
+
+        if claim.status_code is None:
+            claim.delete()
+
+        return response
+
+    return wrapper
+
+def purge_expired_keys():
+    """
+    Deletes the idempotency keys older than IDEMPOTENCY_KEY_TTL.
+
+    Returns:
+        int: The number of keys deleted.
+    """
+    deleted, _ = IdempotencyKey.objects.filter(date_created__lt=timezone.now() - _key_ttl()).delete()
+    return deleted
@@ -0,0 +1,89 @@
+"""
+Runs workout plan generations on an in-process worker pool.
+
+Jobs are stored as `PlanGenerationJob` rows so that any worker process can report their state, while the
+generation itself runs on a thread pool of the process that queued it. No external broker is needed.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from .models import PlanGenerationJob, WorkoutPlan
+from .utils import Workout
+import logging
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'PLAN_GENERATION_WORKERS', 2),
+    thread_name_prefix='plan-generation')
+
+INTERRUPTED_ERROR = "Workout plan generation was interrupted"
+
+def is_stale(job):
+    """
+    Returns True if a job is still queued or running PLAN_GENERATION_TIMEOUT seconds after it was queued.
+
+    A job only lives in the worker pool of the process that queued it, so a job left queued or running when that
+    process restarts is never picked up again. Such jobs are reported as failed once they are stale.
+    """
+    if job.status not in (PlanGenerationJob.QUEUED, PlanGenerationJob.RUNNING):
+        return False
+
+    timeout = timedelta(seconds=getattr(settings, 'PLAN_GENERATION_TIMEOUT', 60 * 10))
+    return job.date_created < timezone.now() - timeout
+
+def queue_workout_plan(person, preferred_days):
+    """
+    Queues the generation of a workout plan.
+
+    The job is handed to the worker pool once the transaction that created it commits.
+
+    Args:
+        person (Person): The person the workout plan is generated for.
+        preferred_days (list of str): The preferred workout days of the person.
+
+    Returns:
+        PlanGenerationJob: The queued job.
+    """
+    job = PlanGenerationJob.objects.create(person=person, preferred_days=preferred_days)
+    transaction.on_commit(lambda: _executor.submit(run_plan_generation, job.id))
+    return job
+
+def run_plan_generation(job_id):
+    """
+    Generates the workout plan of a queued job and records the outcome on the job.
+
+    Args:
+        job_id (UUID): The id of the job to run.
+    """
+    try:
+        job = PlanGenerationJob.objects.select_related('person').get(id=job_id)
+
+        if is_stale(job):
+            # the job has already been reported as failed, it is not run late
+            result = INTERRUPTED_ERROR
+        else:
+            job.status = PlanGenerationJob.RUNNING
+            job.save(update_fields=['status'])
+
+            try:
+                result = Workout().generate_workout_plan(job.person, job.preferred_days)
+            except Exception:
+                logger.exception("Plan generation %s failed", job_id)
+                result = "Workout Plan Not Created"
+
+        if isinstance(result, WorkoutPlan):
+            job.status = PlanGenerationJob.FINISHED
+            job.workout_plan = result
+        else:
+            job.status = PlanGenerationJob.FAILED
+            job.error = result
+
+        job.date_finished = timezone.now()
+        job.save(update_fields=['status', 'workout_plan', 'error', 'date_finished'])
+
+    finally:
+        # Worker threads outlive requests, so they have to release their connection themselves
+        connection.close()
@@ -0,0 +1,54 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from api.middleware import brotli
+from api.models import Person, WorkoutPlan
+from api.renderers import MSGPACK_AVAILABLE, MessagePackRenderer
+from api.serializers import WorkoutPlanTreeSerializer, prefetch_plan_tree
+from api.utils import Workout
+import gzip
+import time
+
+class Command(BaseCommand):
+    help = (
+        "Compares the size and encoding time of a generated workout plan tree as JSON and MessagePack, "
+        "uncompressed, gzipped and brotli compressed. Nothing is kept in the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', nargs='+', default=['Monday', 'Wednesday', 'Friday', 'Saturday'], help="The preferred days of the generated plan.")
+        parser.add_argument('--iterations', type=int, default=50, help="The number of times every format is encoded.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user = User.objects.create(username='response-format-benchmark')
+            person = Person.objects.create(user=user, hashed_id='response-format-benchmark', gender='male', height=1.8, weight=75)
+            workout_plan = Workout().generate_workout_plan(person, options['days'])
+            workout_plan = prefetch_plan_tree(WorkoutPlan.objects.filter(id=workout_plan.id)).get()
+            transaction.set_rollback(True)
+
+        data = {'data': WorkoutPlanTreeSerializer(workout_plan).data, 'gender': person.gender}
+
+        formats = [('json', JSONRenderer().render)]
+        if MSGPACK_AVAILABLE:
+            formats.append(('msgpack', MessagePackRenderer().render))
+        else:
+            self.stderr.write("msgpack is not installed, MessagePack is skipped")
+
+        compressions = [('none', lambda content: content), ('gzip', lambda content: gzip.compress(content, compresslevel=6, mtime=0))]
+        if brotli is not None:
+            compressions.append(('br', lambda content: brotli.compress(content, quality=5)))
+        else:
+            self.stderr.write("brotli is not installed, brotli is skipped")
+
+        iterations = options['iterations']
+        self.stdout.write(f"{'format':<10}{'encoding':<10}{'bytes':>10}{'ms per response':>18}")
+        for format_name, render in formats:
+            for compression_name, compress in compressions:
+                start = time.perf_counter()
+                for _ in range(iterations):
+                    content = compress(render(data))
+                elapsed = (time.perf_counter() - start) / iterations * 1000
+
+                self.stdout.write(f"{format_name:<10}{compression_name:<10}{len(content):>10}{elapsed:>18.3f}")
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from api.snapshots import find_stale_snapshots, write_plan_snapshots
+
+class Command(BaseCommand):
+    help = "Compares the JSON snapshots of workout plans with their trees and reports the missing and stale ones."
+
+    def add_arguments(self, parser):
+        parser.add_argument('workout_plan_ids', nargs='*', type=int, help="The workout plans to check, every plan when omitted.")
+        parser.add_argument('--fix', action='store_true', help="Rewrites the missing and stale snapshots.")
+
+    def handle(self, *args, **options):
+        missing, stale = find_stale_snapshots(options['workout_plan_ids'] or None)
+
+        for workout_plan_id in missing:
+            self.stdout.write(f"Workout plan {workout_plan_id} has no snapshot")
+        for workout_plan_id in stale:
+            self.stdout.write(f"Workout plan {workout_plan_id} has a stale snapshot")
+
+        if not missing and not stale:
+            self.stdout.write("Every snapshot matches its workout plan")
+            return
+
+        if options['fix']:
+            with transaction.atomic():
+                write_plan_snapshots(missing + stale)
+            self.stdout.write(f"{len(missing) + len(stale)} snapshots rewritten")
+            return
+
+        raise CommandError(f"{len(missing)} missing and {len(stale)} stale snapshots")
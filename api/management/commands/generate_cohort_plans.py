@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from api.cohort import generate_cohort_plans
+import json
+import os
+
+class Command(BaseCommand):
+    help = (
+        "Generates the workout plans of a cohort from a JSON file holding a list of "
+        "{\"hashedId\": ..., \"preferredDays\": [...]} objects and prints a per-person report."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="The JSON file listing the members of the cohort.")
+        parser.add_argument('--processes', type=int, default=os.cpu_count(), help="The size of the process pool selecting the exercises.")
+        parser.add_argument('--chunk-size', type=int, default=500, help="The number of plans inserted per transaction.")
+        parser.add_argument('--output', help="Writes the JSON report to this file instead of standard output.")
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path']) as cohort_file:
+                members = json.load(cohort_file)
+            entries = [(member['hashedId'], member['preferredDays']) for member in members]
+        except (OSError, ValueError, KeyError, TypeError) as error:
+            raise CommandError(f"Could not read the cohort: {error}")
+
+        reports = generate_cohort_plans(entries, processes=options['processes'], chunk_size=options['chunk_size'])
+
+        if options['output']:
+            with open(options['output'], 'w') as output_file:
+                json.dump(reports, output_file, indent=2)
+        else:
+            self.stdout.write(json.dumps(reports, indent=2))
+
+        created = sum(report['success'] for report in reports)
+        self.stderr.write(f"{created} of {len(reports)} workout plans created")
@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from api.idempotency import purge_expired_keys
+
+class Command(BaseCommand):
+    help = "Deletes the idempotency keys older than IDEMPOTENCY_KEY_TTL."
+
+    def handle(self, *args, **options):
+        deleted = purge_expired_keys()
+        self.stdout.write(f"{deleted} expired idempotency keys deleted")
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from api.models import WorkoutPlan
+from api.snapshots import write_plan_snapshots
+
+class Command(BaseCommand):
+    help = "Writes the JSON snapshots of workout plans from scratch."
+
+    def add_arguments(self, parser):
+        parser.add_argument('workout_plan_ids', nargs='*', type=int, help="The workout plans to rebuild, every plan when omitted.")
+        parser.add_argument('--batch-size', type=int, default=200, help="The number of plans serialized per transaction.")
+
+    def handle(self, *args, **options):
+        workout_plans = WorkoutPlan.objects.order_by('id')
+        if options['workout_plan_ids']:
+            workout_plans = workout_plans.filter(id__in=options['workout_plan_ids'])
+        ids = list(workout_plans.values_list('id', flat=True))
+
+        written = 0
+        batch_size = options['batch_size']
+        for start in range(0, len(ids), batch_size):
+            with transaction.atomic():
+                written += write_plan_snapshots(ids[start:start + batch_size])
+
+        self.stdout.write(f"{written} workout plan snapshots rebuilt")
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from api.progress import rebuild_progress_counters
+
+class Command(BaseCommand):
+    help = "Recounts the total and finished exercises of every day, week and workout plan and finishes those whose exercises are all finished."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rebuild_progress_counters()
+
+        self.stdout.write("Progress counters rebuilt")
@@ -0,0 +1,78 @@
+"""
+Compresses responses above a size threshold with brotli or gzip, whichever the client accepts.
+
+Brotli compression uses the `brotli` package pinned in requirements.txt, an install missing it only uses gzip.
+The threshold, the compression levels and whether brotli is offered come from the RESPONSE_COMPRESSION settings.
+"""
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+import gzip
+import re
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+_accepts_brotli = re.compile(r'\bbr\b')
+_accepts_gzip = re.compile(r'\bgzip\b')
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compresses the body of non streaming responses of at least `min_size` bytes.
+
+    Built on `MiddlewareMixin` like Django's `GZipMiddleware`, so it runs in both the sync and the async request
+    paths and does not force the async views to run one at a time in sync mode.
+
+    Attributes:
+        min_size (int): The smallest body, in bytes, that is compressed.
+        gzip_level (int): The gzip compression level.
+        brotli_quality (int): The brotli compression quality.
+        use_brotli (bool): Whether brotli is offered, False when the `brotli` package is not installed.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        options = getattr(settings, 'RESPONSE_COMPRESSION', {})
+        self.min_size = options.get('MIN_SIZE', 1024)
+        self.gzip_level = options.get('GZIP_LEVEL', 6)
+        self.brotli_quality = options.get('BROTLI_QUALITY', 5)
+        self.use_brotli = brotli is not None and options.get('BROTLI', True)
+
+    def _encoding(self, request):
+        accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        if self.use_brotli and _accepts_brotli.search(accept_encoding):
+            return 'br'
+        if _accepts_gzip.search(accept_encoding):
+            return 'gzip'
+        return None
+
+    def process_response(self, request, response):
+        if response.streaming or response.has_header('Content-Encoding') or len(response.content) < self.min_size:
+            return response
+
+        # the response differs with the Accept-Encoding header whether or not this request is compressed
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        encoding = self._encoding(request)
+        if encoding == 'br':
+            compressed = brotli.compress(response.content, quality=self.brotli_quality)
+        elif encoding == 'gzip':
+            compressed = gzip.compress(response.content, compresslevel=self.gzip_level, mtime=0)
+        else:
+            return response
+
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+
+        # the compressed body is no longer byte for byte the representation the ETag was computed for
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+
+        return response
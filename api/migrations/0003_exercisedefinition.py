@@ -0,0 +1,36 @@
+# Generated by Django 4.2 on 2026-10-18 07:07
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_plangenerationjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExerciseDefinition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('description', models.TextField()),
+                ('time_based', models.BooleanField(default=False)),
+                ('time', models.CharField(max_length=30, null=True)),
+                ('no_time_limit', models.BooleanField(default=False)),
+                ('link', models.URLField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='exercise',
+            name='definition',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, to='api.exercisedefinition'),
+        ),
+        migrations.AddField(
+            model_name='exercisesteps',
+            name='definition',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='api.exercisedefinition'),
+        ),
+    ]
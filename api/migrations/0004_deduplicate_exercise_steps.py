@@ -0,0 +1,40 @@
+from django.db import migrations
+
+
+def deduplicate_exercise_steps(apps, schema_editor):
+    """
+    Creates one ExerciseDefinition per exercise name, points every Exercise at it and keeps a single copy of the
+    steps: those of the oldest exercise of that name.
+    """
+    Exercise = apps.get_model('api', 'Exercise')
+    ExerciseDefinition = apps.get_model('api', 'ExerciseDefinition')
+    ExerciseSteps = apps.get_model('api', 'ExerciseSteps')
+
+    first_exercises = {}
+    for exercise in Exercise.objects.order_by('id').iterator():
+        first_exercises.setdefault(exercise.name, exercise)
+
+    for name, exercise in first_exercises.items():
+        definition = ExerciseDefinition.objects.create(
+            name=name,
+            description=exercise.description,
+            time_based=exercise.time_based,
+            time=exercise.time,
+            no_time_limit=exercise.no_time_limit,
+            link=exercise.link)
+
+        Exercise.objects.filter(name=name).update(definition=definition)
+        ExerciseSteps.objects.filter(exercise=exercise).update(definition=definition)
+
+    ExerciseSteps.objects.filter(definition__isnull=True).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_exercisedefinition'),
+    ]
+
+    operations = [
+        migrations.RunPython(deduplicate_exercise_steps, migrations.RunPython.noop),
+    ]
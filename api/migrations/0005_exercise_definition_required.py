@@ -0,0 +1,28 @@
+# Generated by Django 4.2 on 2026-10-18 07:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_deduplicate_exercise_steps'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='exercisesteps',
+            name='exercise',
+        ),
+        migrations.AlterField(
+            model_name='exercise',
+            name='definition',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='api.exercisedefinition'),
+        ),
+        migrations.AlterField(
+            model_name='exercisesteps',
+            name='definition',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.exercisedefinition'),
+        ),
+    ]
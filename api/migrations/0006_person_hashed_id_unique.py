@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 07:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_exercise_definition_required'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='person',
+            name='hashed_id',
+            field=models.CharField(max_length=64, unique=True),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2 on 2026-10-18 07:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_person_hashed_id_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='day',
+            name='finished_exercises',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='day',
+            name='total_exercises',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='week',
+            name='finished_exercises',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='week',
+            name='total_exercises',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='workoutplan',
+            name='finished_exercises',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='workoutplan',
+            name='total_exercises',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def populate_progress_counters(apps, schema_editor):
+    Exercise = apps.get_model('api', 'Exercise')
+
+    def count_exercises(parent_path, **filters):
+        exercises = Exercise.objects.filter(**{parent_path: OuterRef('pk')}, **filters)
+        return Coalesce(Subquery(exercises.order_by().values(parent_path).annotate(count=Count('id')).values('count')), 0)
+
+    for model_name, parent_path in (('Day', 'day'), ('Week', 'day__week'), ('WorkoutPlan', 'day__week__workout_plan')):
+        apps.get_model('api', model_name).objects.update(
+            total_exercises=count_exercises(parent_path),
+            finished_exercises=count_exercises(parent_path, finished=True))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_progress_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_progress_counters, migrations.RunPython.noop),
+    ]
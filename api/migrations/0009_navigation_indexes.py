@@ -0,0 +1,25 @@
+# Generated by Django 4.2 on 2026-10-18 07:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_populate_progress_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='day',
+            index=models.Index(fields=['week', 'number'], name='api_day_week_id_0a245d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='week',
+            index=models.Index(fields=['workout_plan', 'number'], name='api_week_workout_963e8c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workoutplan',
+            index=models.Index(fields=['person', 'date_created'], name='api_workout_person__7b7528_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2 on 2026-10-18 07:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_workoutplan_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkoutPlanSnapshot',
+            fields=[
+                ('workout_plan', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='snapshot', serialize=False, to='api.workoutplan')),
+                ('document', models.TextField()),
+                ('date_updated', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2 on 2026-10-18 07:22
+
+from django.db import migrations, models
+
+
+def create_change_sequence(apps, schema_editor):
+    ChangeSequence = apps.get_model('api', 'ChangeSequence')
+    ChangeSequence.objects.create(id=1, value=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_workoutplansnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='day',
+            name='change_seq',
+            field=models.BigIntegerField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='exercise',
+            name='change_seq',
+            field=models.BigIntegerField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='week',
+            name='change_seq',
+            field=models.BigIntegerField(db_index=True, default=0),
+        ),
+        migrations.AddField(
+            model_name='workoutplan',
+            name='change_seq',
+            field=models.BigIntegerField(db_index=True, default=0),
+        ),
+        migrations.RunPython(create_change_sequence, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 07:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_change_sequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exercise',
+            name='version',
+            field=models.IntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.2 on 2026-10-18 07:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def renumber_and_seed_plan_numbers(apps, schema_editor):
+    """
+    Renumbers the plans of persons who got the same plan number twice, in creation order, and starts the plan
+    number sequence of every person after their highest plan number.
+    """
+    WorkoutPlan = apps.get_model('api', 'WorkoutPlan')
+    PlanNumberSequence = apps.get_model('api', 'PlanNumberSequence')
+
+    duplicated = (
+        WorkoutPlan.objects.values('person', 'number')
+        .annotate(count=models.Count('id'))
+        .filter(count__gt=1)
+        .values_list('person', flat=True)
+        .distinct())
+
+    for person_id in set(duplicated):
+        workout_plans = list(WorkoutPlan.objects.filter(person=person_id).order_by('date_created', 'id'))
+        for number, workout_plan in enumerate(workout_plans, start=1):
+            workout_plan.number = number
+        WorkoutPlan.objects.bulk_update(workout_plans, ['number'])
+
+    latest_numbers = WorkoutPlan.objects.values_list('person').annotate(models.Max('number'))
+    PlanNumberSequence.objects.bulk_create(
+        PlanNumberSequence(person_id=person_id, last_number=last_number) for person_id, last_number in latest_numbers)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_exercise_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlanNumberSequence',
+            fields=[
+                ('person', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='api.person')),
+                ('last_number', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(renumber_and_seed_plan_numbers, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='workoutplan',
+            constraint=models.UniqueConstraint(fields=('person', 'number'), name='unique_workout_plan_number_per_person'),
+        ),
+    ]
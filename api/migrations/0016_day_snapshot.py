@@ -0,0 +1,61 @@
+# Generated by Django 4.2 on 2026-10-18 07:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+import json
+
+
+def dump_document(data):
+    return json.dumps(data, separators=(',', ':'))
+
+
+def split_plan_snapshots(apps, schema_editor):
+    """
+    Moves the days of every stored workout plan document into day snapshots, leaving their ids in the plan document.
+    """
+    WorkoutPlanSnapshot = apps.get_model('api', 'WorkoutPlanSnapshot')
+    DaySnapshot = apps.get_model('api', 'DaySnapshot')
+
+    for snapshot in WorkoutPlanSnapshot.objects.iterator():
+        plan = json.loads(snapshot.document)
+        day_snapshots = []
+        for week in plan['weeks']:
+            day_snapshots += [
+                DaySnapshot(day_id=day['id'], workout_plan_id=snapshot.workout_plan_id, document=dump_document(day))
+                for day in week['days']]
+            week['days'] = [day['id'] for day in week['days']]
+
+        DaySnapshot.objects.bulk_create(day_snapshots)
+        WorkoutPlanSnapshot.objects.filter(workout_plan=snapshot.workout_plan_id).update(document=dump_document(plan))
+
+
+def join_plan_snapshots(apps, schema_editor):
+    WorkoutPlanSnapshot = apps.get_model('api', 'WorkoutPlanSnapshot')
+    DaySnapshot = apps.get_model('api', 'DaySnapshot')
+
+    for snapshot in WorkoutPlanSnapshot.objects.iterator():
+        days = {day_id: json.loads(document) for day_id, document in DaySnapshot.objects.filter(workout_plan=snapshot.workout_plan_id).values_list('day', 'document')}
+        plan = json.loads(snapshot.document)
+        for week in plan['weeks']:
+            week['days'] = [days[day_id] for day_id in week['days']]
+
+        WorkoutPlanSnapshot.objects.filter(workout_plan=snapshot.workout_plan_id).update(document=dump_document(plan))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DaySnapshot',
+            fields=[
+                ('day', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='snapshot', serialize=False, to='api.day')),
+                ('document', models.TextField()),
+                ('workout_plan', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='day_snapshots', to='api.workoutplan')),
+            ],
+        ),
+        migrations.RunPython(split_plan_snapshots, join_plan_snapshots),
+    ]
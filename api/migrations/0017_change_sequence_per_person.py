@@ -0,0 +1,47 @@
+# Generated by Django 4.2 on 2026-10-18 07:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def split_change_sequence(apps, schema_editor):
+    """
+    Replaces the single change sequence with one per person, each starting at the last number handed out so the
+    cursors clients already hold stay valid.
+    """
+    ChangeSequence = apps.get_model('api', 'ChangeSequence')
+    Person = apps.get_model('api', 'Person')
+
+    last_value = ChangeSequence.objects.filter(person__isnull=True).aggregate(value=models.Max('value'))['value'] or 0
+    ChangeSequence.objects.all().delete()
+    ChangeSequence.objects.bulk_create(
+        ChangeSequence(person_id=person_id, value=last_value) for person_id in Person.objects.values_list('id', flat=True).iterator())
+
+
+def join_change_sequences(apps, schema_editor):
+    ChangeSequence = apps.get_model('api', 'ChangeSequence')
+
+    last_value = ChangeSequence.objects.aggregate(value=models.Max('value'))['value'] or 0
+    ChangeSequence.objects.all().delete()
+    ChangeSequence.objects.create(id=1, value=last_value)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_day_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='changesequence',
+            name='person',
+            field=models.OneToOneField(null=True, on_delete=django.db.models.deletion.CASCADE, to='api.person'),
+        ),
+        migrations.RunPython(split_change_sequence, join_change_sequences),
+        migrations.AlterField(
+            model_name='changesequence',
+            name='person',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to='api.person'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2 on 2026-10-18 07:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_change_sequence_per_person'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='day',
+            name='change_seq',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='exercise',
+            name='change_seq',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='week',
+            name='change_seq',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='workoutplan',
+            name='change_seq',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='day',
+            index=models.Index(fields=['week', 'change_seq'], name='api_day_week_id_64bfd1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='exercise',
+            index=models.Index(fields=['day', 'change_seq'], name='api_exercis_day_id_fc7853_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='week',
+            index=models.Index(fields=['workout_plan', 'change_seq'], name='api_week_workout_c96a18_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workoutplan',
+            index=models.Index(fields=['person', 'change_seq'], name='api_workout_person__8a5634_idx'),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
+from django.db.models import Case, Value, When
 from django.contrib.auth.models import User
 from django.utils import timezone
+import uuid
 
 class Person(models.Model):
     """
@@ -23,7 +25,7 @@ class Person(models.Model):
         weight <weight>\n
     """
     user = models.OneToOneField(User, on_delete=models.CASCADE)
-    hashed_id = models.CharField(max_length=64)
+    hashed_id = models.CharField(max_length=64, unique=True)
     gender = models.CharField(max_length=10)
     height = models.FloatField()
     weight = models.FloatField()
@@ -45,10 +47,15 @@ class WorkoutPlan(models.Model):
     Attributes:
         person (ForeignKey): The user who the workout plan belongs to.
         name (CharField): The name of the workout plan.
-        number (IntegerField): The number of the workout plan
+        number (IntegerField): The number of the workout plan, unique per person and handed out by api.numbering
         started (BooleanField): Indicates whether the workout plan has been started.
         finished (BooleanField): Indicates whether the workout plan has been completed.
         date_created (DateTimeField): The date and time when the workout plan was created.
+        total_exercises (IntegerField): The number of exercises in the workout plan.
+        finished_exercises (IntegerField): The number of finished exercises in the workout plan.
+        version (IntegerField): Incremented by every write to the plan or its weeks, days and exercises, used to
+            build the ETags of the listing endpoints.
+        change_seq (BigIntegerField): The change sequence number of the last write to the plan, see api.sync.
 
     Methods:
         __str__: Returns a string representation of the workout plan in the format "<username>'s workout plan <number>".
@@ -59,12 +66,18 @@ class WorkoutPlan(models.Model):
     started = models.BooleanField(default=False)
     finished = models.BooleanField(default=False)
     date_created = models.DateTimeField(auto_now_add=True)
+    total_exercises = models.IntegerField(default=0)
+    finished_exercises = models.IntegerField(default=0)
+    version = models.IntegerField(default=1)
+    change_seq = models.BigIntegerField(default=0)
 
     def __str__(self):
         return f"{self.person.user.username}'s workout plan {self.number}"
 
     class Meta:
         get_latest_by = "date_created"
+        indexes = [models.Index(fields=['person', 'date_created']), models.Index(fields=['person', 'change_seq'])]
+        constraints = [models.UniqueConstraint(fields=['person', 'number'], name='unique_workout_plan_number_per_person')]
 
 class Week(models.Model):
     """
@@ -75,11 +88,18 @@ class Week(models.Model):
         number (IntegerField): The number of the week within the workout plan.
         current_week (BooleanField): Indicates whether the week is the current exercise week.
         finished (BooleanField): Indicates whether the week has been completed.
+        total_exercises (IntegerField): The number of exercises in the week.
+        finished_exercises (IntegerField): The number of finished exercises in the week.
+        change_seq (BigIntegerField): The change sequence number of the last write to the week, see api.sync.
 
     Methods:
         get_next: Returns the next week instance, if it exists.
         has_next: Returns True if the next week instance exists, False otherwise.
-        set_next_as_current: Sets the next week instance as the current week.
+        set_next_as_current: Sets the next week instance as the current week, returns False if there is none. Both
+            weeks are stamped with the optional change sequence number.
+
+        The next week is the one with the following number within the same workout plan, found through the
+        (workout_plan, number) index.
 
         __str__ method returns a string representation of the week in the format "Week <number> from <workout_plan> with a <finished_status> status".
     """
@@ -88,29 +108,38 @@ class Week(models.Model):
     current_week = models.BooleanField(default=False)
     finished = models.BooleanField(default=False)
     date_created = models.DateTimeField(auto_now_add=True)
+    total_exercises = models.IntegerField(default=0)
+    finished_exercises = models.IntegerField(default=0)
+    change_seq = models.BigIntegerField(default=0)
+
+    def _following_weeks(self):
+        return self.__class__.objects.filter(workout_plan_id=self.workout_plan_id, number__gt=self.number)
 
     def get_next(self):
-        return self.__class__.objects.filter(id__gt=self.id).order_by('id').first()
+        return self._following_weeks().order_by('number').first()
     
     def has_next(self):
-        return self.get_next() is not None
+        return self._following_weeks().exists()
     
-    def set_next_as_current(self):
-        next_week = self.get_next()
-        if next_week is not None:
-            # Set current week's "current_week" field to False
-            self.current_week = False
-            self.save()
-            
-            # Set next week's "current_week" field to True
-            next_week.current_week = True
-            next_week.save()
+    def set_next_as_current(self, change_seq=None):
+        next_number = self._following_weeks().order_by('number').values_list('number', flat=True).first()
+        if next_number is None:
+            return False
+
+        # Moves the "current_week" flag from this week to the next one in a single statement
+        changes = {'current_week': Case(When(number=next_number, then=Value(True)), default=Value(False))}
+        if change_seq is not None:
+            changes['change_seq'] = change_seq
+        self.__class__.objects.filter(workout_plan_id=self.workout_plan_id, number__in=(self.number, next_number)).update(**changes)
+        self.current_week = False
+        return True
     
     def __str__(self):
         return f"Week {self.number} from {self.workout_plan} with a {'finished' if self.finished else 'unfinished'} status"
 
     class Meta:
         get_latest_by = "date_created"
+        indexes = [models.Index(fields=['workout_plan', 'number']), models.Index(fields=['workout_plan', 'change_seq'])]
 
 class Day(models.Model):
     """
@@ -121,6 +150,9 @@ class Day(models.Model):
         number (IntegerField): The number of the day within the week.
         name (CharField): The name of the day.
         finished (BooleanField): Indicates whether the day has been completed.
+        total_exercises (IntegerField): The number of exercises in the day.
+        finished_exercises (IntegerField): The number of finished exercises in the day.
+        change_seq (BigIntegerField): The change sequence number of the last write to the day, see api.sync.
 
     Methods:
         __str__: Returns a string representation of the day in the format "Day <day_number> of <week> with a <finished_status> status".
@@ -129,16 +161,48 @@ class Day(models.Model):
     number = models.IntegerField()
     name = models.CharField(max_length=9)
     finished = models.BooleanField(default=False)
+    total_exercises = models.IntegerField(default=0)
+    finished_exercises = models.IntegerField(default=0)
+    change_seq = models.BigIntegerField(default=0)
 
     def __str__(self):
         return f"Day {self.day_number} of {self.week} with a {'finished' if self.finished else 'unfinished'} status"
 
+    class Meta:
+        indexes = [models.Index(fields=['week', 'number']), models.Index(fields=['week', 'change_seq'])]
+
+class ExerciseDefinition(models.Model):
+    """
+    A model representing an exercise of the catalog, shared by every generated exercise of the same name.
+
+    Attributes:
+        name (CharField): The unique name of the exercise.
+        description (TextField): A description of the exercise.
+        time_based (BooleanField): Indicates whether the exercise is time-based. Default is False.
+        time (CharField): The duration of the exercise in minutes or seconds. Optional.
+        no_time_limit (BooleanField): Indicates whether there is no time limit for the exercise. Default is False.
+        link (URLField): A link to the exercise demonstration or instructions.
+
+    Methods:
+        __str__: Returns the name of the exercise.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    description = models.TextField()
+    time_based = models.BooleanField(default=False)
+    time = models.CharField(max_length=30, null=True)
+    no_time_limit = models.BooleanField(default=False)
+    link = models.URLField()
+
+    def __str__(self):
+        return self.name
+
 class Exercise(models.Model):
     """
     A model representing an exercise within a day of a week within a workout plan.
 
     Attributes:
         day (ForeignKey): The day the exercise belongs to.
+        definition (ForeignKey): The catalog exercise this exercise was generated from, it holds the steps.
         name (CharField): The name of the exercise.
         description (TextField): A description of the exercise.
         finished (BooleanField): Indicates whether the exercise has been completed.
@@ -148,11 +212,15 @@ class Exercise(models.Model):
         time (CharField): The duration of the exercise in minutes or seconds. Optional.
         no_time_limit (BooleanField): Indicates whether there is no time limit for the exercise. Default is False.
         link (URLField): A link to the exercise demonstration or instructions.
+        version (IntegerField): Incremented by every write to the exercise, writes only apply to the version they
+            were made against.
+        change_seq (BigIntegerField): The change sequence number of the last write to the exercise, see api.sync.
 
     Methods:
         __str__: Returns a string representation of the exercise in the format "<day>: <name> (<reps> reps x <sets> sets)".
     """
     day = models.ForeignKey(Day, on_delete=models.CASCADE)
+    definition = models.ForeignKey(ExerciseDefinition, on_delete=models.PROTECT)
     name = models.CharField(max_length=255)
     description = models.TextField()
     finished = models.BooleanField(default=False)
@@ -162,23 +230,173 @@ class Exercise(models.Model):
     time = models.CharField(max_length=30, null=True)
     no_time_limit = models.BooleanField(default=False)
     link = models.URLField()
+    version = models.IntegerField(default=1)
+    change_seq = models.BigIntegerField(default=0)
 
     def __str__(self):
         return f'{self.day}: {self.name} ({self.reps} reps x {self.sets} sets)'
 
+    class Meta:
+        indexes = [models.Index(fields=['day', 'change_seq'])]
+
 class ExerciseSteps(models.Model):
     """
-    A step for an exercise in a workout plan.
+    A step of a catalog exercise, shared by every generated exercise of the same name.
 
     Attributes:
-        exercise (ForeignKey): The exercise that this step belongs to.
+        definition (ForeignKey): The exercise definition that this step belongs to.
         instruction (CharField): The description of the step.
 
     Methods:
-        __str__: Returns a string representation of the step in the format "<exercise>: <step>".
+        __str__: Returns a string representation of the step in the format "<definition>: <step>".
     """
-    exercise = models.ForeignKey(Exercise, on_delete=models.CASCADE)
+    definition = models.ForeignKey(ExerciseDefinition, on_delete=models.CASCADE)
     instruction = models.CharField(max_length=255)
 
     def __str__(self):
-        return f'{self.exercise}: {self.instruction}'
\ No newline at end of file
+        return f'{self.definition}: {self.instruction}'
+
+class PlanGenerationJob(models.Model):
+    """
+    A workout plan generation queued to the in-process worker pool.
+
+    Attributes:
+        id (UUIDField): The unguessable identifier handed to the client.
+        person (ForeignKey): The person the workout plan is generated for.
+        preferred_days (JSONField): The preferred workout days of the person.
+        status (CharField): Whether the job is queued, running, finished or failed.
+        workout_plan (ForeignKey): The generated workout plan, once the job has finished.
+        error (CharField): The reason the job failed, if it did.
+        date_created (DateTimeField): The date and time when the job was queued.
+        date_finished (DateTimeField): The date and time when the job finished or failed.
+
+    Methods:
+        __str__: Returns a string representation of the job in the format "Plan generation <id> for <person> is <status>".
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FINISHED = 'finished'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (FINISHED, 'Finished'),
+        (FAILED, 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    person = models.ForeignKey(Person, on_delete=models.CASCADE)
+    preferred_days = models.JSONField()
+    status = models.CharField(max_length=8, choices=STATUS_CHOICES, default=QUEUED)
+    workout_plan = models.ForeignKey(WorkoutPlan, on_delete=models.SET_NULL, null=True)
+    error = models.CharField(max_length=255, blank=True)
+    date_created = models.DateTimeField(auto_now_add=True)
+    date_finished = models.DateTimeField(null=True)
+
+    def __str__(self):
+        return f"Plan generation {self.id} for {self.person.hashed_id} is {self.status}"
+
+class WorkoutPlanSnapshot(models.Model):
+    """
+    The serialized workout plan and weeks of a workout plan tree, kept in step with the plan by the views writing to
+    it so it can be served without serializing anything. The days of every week are stored as a list of day ids,
+    their documents are the `DaySnapshot` of each day, see api.snapshots.
+
+    Attributes:
+        workout_plan (OneToOneField): The workout plan the document describes, also the primary key.
+        document (TextField): The JSON document, as produced by `WorkoutPlanTreeSerializer` with the days replaced by
+            their ids.
+        date_updated (DateTimeField): The date and time when the document was last written or patched.
+
+    Methods:
+        __str__: Returns a string representation of the snapshot in the format "Snapshot of <workout_plan>".
+    """
+    workout_plan = models.OneToOneField(WorkoutPlan, on_delete=models.CASCADE, primary_key=True, related_name='snapshot')
+    document = models.TextField()
+    date_updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Snapshot of {self.workout_plan}"
+
+class DaySnapshot(models.Model):
+    """
+    The serialized exercise and step tree of a day, the part of a workout plan snapshot a write to one exercise
+    changes.
+
+    Attributes:
+        day (OneToOneField): The day the document describes, also the primary key.
+        workout_plan (ForeignKey): The workout plan of the day, so the days of a plan are read with one query.
+        document (TextField): The JSON document of the day, as produced by `DayTreeSerializer`.
+
+    Methods:
+        __str__: Returns a string representation of the snapshot in the format "Snapshot of <day>".
+    """
+    day = models.OneToOneField(Day, on_delete=models.CASCADE, primary_key=True, related_name='snapshot')
+    workout_plan = models.ForeignKey(WorkoutPlan, on_delete=models.CASCADE, related_name='day_snapshots')
+    document = models.TextField()
+
+    def __str__(self):
+        return f"Snapshot of {self.day}"
+
+class ChangeSequence(models.Model):
+    """
+    The counter handing out the change sequence numbers of a person's workout plans, see api.sync.
+
+    Attributes:
+        person (OneToOneField): The person whose rows are stamped with the numbers.
+        value (BigIntegerField): The last change sequence number handed out.
+
+    Methods:
+        __str__: Returns a string representation of the sequence in the format "Changes of <hashed_id> at <value>".
+    """
+    person = models.OneToOneField(Person, on_delete=models.CASCADE)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"Changes of {self.person.hashed_id} at {self.value}"
+
+class PlanNumberSequence(models.Model):
+    """
+    The counter handing out the numbers of a person's workout plans, see api.numbering.
+
+    Attributes:
+        person (OneToOneField): The person the numbers are handed out for, also the primary key.
+        last_number (IntegerField): The last workout plan number handed out.
+
+    Methods:
+        __str__: Returns a string representation of the sequence in the format "Plan numbers of <hashed_id> at <last_number>".
+    """
+    person = models.OneToOneField(Person, on_delete=models.CASCADE, primary_key=True)
+    last_number = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"Plan numbers of {self.person.hashed_id} at {self.last_number}"
+
+class IdempotencyKey(models.Model):
+    """
+    The outcome of a mutating request sent with an Idempotency-Key header, replayed when the request is retried,
+    see api.idempotency.
+
+    Attributes:
+        person (ForeignKey): The person who sent the request, keys are unique per person.
+        key (CharField): The value of the Idempotency-Key header.
+        fingerprint (CharField): The hash of the method, path and body of the request the key was first used for.
+        status_code (PositiveSmallIntegerField): The status of the stored response, null while the request runs.
+        response_body (TextField): The JSON body of the stored response.
+        date_created (DateTimeField): The date and time when the key was first used.
+
+    Methods:
+        __str__: Returns a string representation of the key in the format "Idempotency key <key> of <hashed_id>".
+    """
+    person = models.ForeignKey(Person, on_delete=models.CASCADE)
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response_body = models.TextField(blank=True)
+    date_created = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['person', 'key'], name='unique_idempotency_key_per_person')]
+
+    def __str__(self):
+        return f"Idempotency key {self.key} of {self.person.hashed_id}"
@@ -0,0 +1,66 @@
+"""
+Hands out workout plan numbers without serializing plan generation.
+
+Every person has a `PlanNumberSequence` row holding the last number handed out. Numbers are taken with an atomic
+F() increment of that row, which stays locked until the generating transaction commits, so concurrent generations
+for the same person wait on each other and get distinct numbers. The unique (person, number) constraint on
+`WorkoutPlan` backs the allocator up.
+
+The only other counter a generation increments is the change sequence of the same person, see api.sync, so
+generations for different persons do not wait on each other. SQLite still runs every writing transaction one at a
+time.
+"""
+from collections import defaultdict
+from django.db.models import F, Max
+from .models import PlanNumberSequence, WorkoutPlan
+
+def _create_missing_sequences(person_ids):
+    """
+    Creates the sequences of persons that have none, starting after their highest existing plan number.
+    """
+    existing = set(PlanNumberSequence.objects.filter(person__in=person_ids).values_list('person', flat=True))
+    missing = set(person_ids) - existing
+    if not missing:
+        return
+
+    latest_numbers = dict(
+        WorkoutPlan.objects.filter(person__in=missing)
+        .values_list('person')
+        .annotate(Max('number')))
+
+    # a sequence created concurrently already starts at the same number
+    PlanNumberSequence.objects.bulk_create(
+        [PlanNumberSequence(person_id=person_id, last_number=latest_numbers.get(person_id, 0)) for person_id in missing],
+        ignore_conflicts=True)
+
+def allocate_plan_numbers(counts):
+    """
+    Takes consecutive workout plan numbers for persons.
+
+    Args:
+        counts (dict): The number of plan numbers to take keyed by person id.
+
+    Returns:
+        dict: The first of the numbers taken for every person, keyed by person id.
+    """
+    counts = {person_id: count for person_id, count in counts.items() if count}
+    if not counts:
+        return {}
+
+    _create_missing_sequences(list(counts))
+
+    # one UPDATE per distinct count, usually a single one
+    person_ids_by_count = defaultdict(list)
+    for person_id, count in counts.items():
+        person_ids_by_count[count].append(person_id)
+    for count, person_ids in person_ids_by_count.items():
+        PlanNumberSequence.objects.filter(person__in=person_ids).update(last_number=F('last_number') + count)
+
+    last_numbers = dict(PlanNumberSequence.objects.filter(person__in=counts).values_list('person', 'last_number'))
+    return {person_id: last_numbers[person_id] - count + 1 for person_id, count in counts.items()}
+
+def allocate_plan_number(person):
+    """
+    Takes the next workout plan number of a person.
+    """
+    return allocate_plan_numbers({person.id: 1})[person.id]
@@ -0,0 +1,164 @@
+"""
+Writes to exercises, shared by the exercise endpoints, the batch endpoint and the sync endpoint.
+
+Writes are optimistic: every exercise has a version, a write only applies to the version it was made against and
+increments it, and a write made against an older version is a conflict the views answer with 409.
+
+An operation is a {'exercise_id', 'action', 'value', 'version'} object, the action being 'finish', 'reps' or 'sets',
+the value the new reps or sets and the optional version the version of the exercise the client last saw.
+"""
+from collections import Counter
+from django.db.models import F
+from .etags import bump_plan_versions
+from .models import Exercise
+from .progress import record_finished_exercises
+from .response_cache import plan_responses
+from .snapshots import patch_plan_snapshot
+from .sync import next_change_seq
+
+OPERATION_ACTIONS = ('finish', 'reps', 'sets')
+MAX_OPERATIONS = 500
+
+def validate_exercise_operations(operations):
+    """
+    Checks the shape of a list of operations.
+
+    Returns:
+        str: The reason the operations are invalid, None if they are valid.
+    """
+    if not isinstance(operations, list):
+        return "Operations must be a list"
+
+    if len(operations) > MAX_OPERATIONS:
+        return f"At most {MAX_OPERATIONS} operations are allowed at once"
+
+    for operation in operations:
+        if not isinstance(operation, dict) or not isinstance(operation.get('exercise_id'), int) or operation.get('action') not in OPERATION_ACTIONS:
+            return "Every operation needs an exercise_id and an action of 'finish', 'reps' or 'sets'"
+
+        value = operation.get('value')
+        if operation['action'] != 'finish' and (not isinstance(value, int) or value < 1):
+            return f"{operation['action'].capitalize()} not provided"
+
+        if operation.get('version') is not None and not isinstance(operation['version'], int):
+            return "Version must be a number"
+
+    return None
+
+def _refresh_plans(exercises, change_seq):
+    """
+    Bumps the versions, patches the snapshots and drops the cached responses of the plans of written exercises.
+    """
+    exercise_ids_by_plan = {}
+    for exercise in exercises:
+        exercise_ids_by_plan.setdefault(exercise.workout_plan_id, []).append(exercise.id)
+
+    bump_plan_versions(exercise_ids_by_plan, change_seq)
+    for workout_plan_id, plan_exercise_ids in exercise_ids_by_plan.items():
+        patch_plan_snapshot(workout_plan_id, plan_exercise_ids)
+    plan_responses.invalidate_on_commit(exercise_ids_by_plan)
+
+def write_exercise(exercise, expected_version, **changes):
+    """
+    Writes the changed columns of one exercise if it still has the expected version. Must run in a transaction.
+
+    The write is a single conditional UPDATE of the changed columns, the version and the change sequence number.
+    Finishing the exercise updates the progress of its day, week and workout plan.
+
+    Args:
+        exercise (Exercise): The exercise, annotated with its `workout_plan_id` and `person_id`.
+        expected_version (int): The version the changes were made against.
+        **changes: The new values of the changed columns.
+
+    Returns:
+        int: The new version of the exercise, None if it no longer has the expected version.
+    """
+    change_seq = next_change_seq(exercise.person_id)
+    written = Exercise.objects.filter(id=exercise.id, version=expected_version).update(
+        version=F('version') + 1, change_seq=change_seq, **changes)
+    if not written:
+        return None
+
+    if changes.get('finished') and not exercise.finished:
+        record_finished_exercises({exercise.day_id: 1}, change_seq)
+
+    _refresh_plans([exercise], change_seq)
+    return expected_version + 1
+
+def apply_exercise_operations(person, operations):
+    """
+    Applies validated operations, in order, to exercises of the person. Must run in a transaction.
+
+    The exercises are loaded, locked and checked to belong to the person with a single query, their versions are
+    compared with the versions of the operations, and they are written with one bulk update. The progress of the
+    affected days, weeks and workout plans is recounted once, and their versions, snapshots and cached responses are
+    refreshed once per plan. Operations that would not change their exercise are skipped, so an exercise that only
+    such operations target keeps its version.
+
+    Args:
+        person (Person): The person the exercises must belong to.
+        operations (list of dict): The operations, see `validate_exercise_operations`.
+
+    Returns:
+        tuple: The number of exercises written to, the sorted ids of the exercises the person does not have and the
+        sorted ids of the exercises whose version differs from the version of an operation. Nothing is written when
+        there are any.
+    """
+    exercise_ids = {operation['exercise_id'] for operation in operations}
+    if not exercise_ids:
+        return 0, [], []
+
+    exercises = {
+        exercise.id: exercise for exercise in Exercise.objects.select_for_update()
+        .filter(id__in=exercise_ids, day__week__workout_plan__person=person)
+        .annotate(workout_plan_id=F('day__week__workout_plan'))
+    }
+
+    missing_ids = exercise_ids - set(exercises)
+    if missing_ids:
+        return 0, sorted(missing_ids), []
+
+    # the rows are locked, so the versions read are the versions the bulk update writes over
+    conflicting_ids = {
+        operation['exercise_id'] for operation in operations
+        if operation.get('version') is not None and operation['version'] != exercises[operation['exercise_id']].version
+    }
+    if conflicting_ids:
+        return 0, [], sorted(conflicting_ids)
+
+    finished_by_day = Counter()
+    changed_fields = {'version', 'change_seq'}
+    changed_exercises = {}
+    for operation in operations:
+        exercise = exercises[operation['exercise_id']]
+
+        # finishing a finished exercise, or setting reps or sets to their value, changes nothing
+        if operation['action'] == 'finish':
+            if exercise.finished:
+                continue
+            exercise.finished = True
+            finished_by_day[exercise.day_id] += 1
+            changed_fields.add('finished')
+        else:
+            if getattr(exercise, operation['action']) == operation['value']:
+                continue
+            setattr(exercise, operation['action'], operation['value'])
+            changed_fields.add(operation['action'])
+
+        changed_exercises[exercise.id] = exercise
+
+    if not changed_exercises:
+        return 0, [], []
+
+    change_seq = next_change_seq(person.id)
+    for exercise in changed_exercises.values():
+        exercise.version += 1
+        exercise.change_seq = change_seq
+    Exercise.objects.bulk_update(changed_exercises.values(), sorted(changed_fields))
+
+    # completion of the affected days, weeks and workout plans is recounted once for all operations
+    record_finished_exercises(finished_by_day, change_seq)
+
+    _refresh_plans(changed_exercises.values(), change_seq)
+
+    return len(changed_exercises), [], []
@@ -0,0 +1,13 @@
+from rest_framework.pagination import CursorPagination
+
+class WorkoutPlanCursorPagination(CursorPagination):
+    """
+    Keyset pagination of a person's workout plans, oldest first.
+
+    Pages are read from the (person, date_created) index with a range condition, so the cost of a page does not
+    depend on how many plans came before it.
+    """
+    ordering = ('date_created', 'id')
+    page_size = 20
+    page_size_query_param = 'pageSize'
+    max_page_size = 100
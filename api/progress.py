@@ -0,0 +1,80 @@
+"""
+Keeps the progress of days, weeks and workout plans in step with their exercises.
+
+Every day, week and workout plan stores how many exercises it holds and how many of them are finished. The
+counters are incremented with F() expressions by the views that finish exercises, so completion checks and
+percentages are single-row reads, and the GET views stay pure reads.
+"""
+from collections import Counter
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from .models import Day, Exercise, Week, WorkoutPlan
+from .response_cache import plan_responses
+
+def record_finished_exercises(finished_by_day, change_seq):
+    """
+    Counts newly finished exercises in their days, weeks and workout plans and updates their progress.
+
+    A day is finished once all of its exercises are, a week once all of its days are, and a workout plan once all
+    of its weeks are. When a week is finished the next week of its plan becomes the current week, and a workout
+    plan is started as soon as one of its exercises is finished. Every changed row is stamped with the change
+    sequence number of the write, see api.sync, the version of every affected plan is bumped and its cached
+    responses are dropped. Must run in the transaction that finished the exercises.
+
+    Args:
+        finished_by_day (dict): The number of newly finished exercises keyed by day id.
+        change_seq (int): The change sequence number of the transaction.
+    """
+    finished_by_day = {day_id: count for day_id, count in finished_by_day.items() if count}
+    if not finished_by_day:
+        return
+
+    finished_by_week = Counter()
+    finished_by_plan = Counter()
+    for day_id, week_id, workout_plan_id in Day.objects.filter(id__in=finished_by_day).values_list('id', 'week', 'week__workout_plan'):
+        finished_by_week[week_id] += finished_by_day[day_id]
+        finished_by_plan[workout_plan_id] += finished_by_day[day_id]
+
+    for day_id, count in finished_by_day.items():
+        Day.objects.filter(id=day_id).update(finished_exercises=F('finished_exercises') + count, change_seq=change_seq)
+    for week_id, count in finished_by_week.items():
+        Week.objects.filter(id=week_id).update(finished_exercises=F('finished_exercises') + count, change_seq=change_seq)
+    for workout_plan_id, count in finished_by_plan.items():
+        WorkoutPlan.objects.filter(id=workout_plan_id).update(
+            started=True, finished_exercises=F('finished_exercises') + count, version=F('version') + 1, change_seq=change_seq)
+
+    Day.objects.filter(id__in=finished_by_day, finished=False, finished_exercises__gte=F('total_exercises')).update(finished=True)
+
+    finished_weeks = list(Week.objects.filter(id__in=finished_by_week, finished=False, finished_exercises__gte=F('total_exercises')))
+    for week in finished_weeks:
+        week.finished = True
+        week.set_next_as_current(change_seq)
+        week.save(update_fields=['finished', 'current_week'])
+
+    WorkoutPlan.objects.filter(id__in=finished_by_plan, finished=False, finished_exercises__gte=F('total_exercises')).update(finished=True)
+
+    plan_responses.invalidate_on_commit(finished_by_plan)
+
+def _count_exercises(parent_path, finished=False):
+    exercises = Exercise.objects.filter(**{parent_path: OuterRef('pk')})
+    if finished:
+        exercises = exercises.filter(finished=True)
+
+    count = exercises.order_by().values(parent_path).annotate(count=Count('id')).values('count')
+    return Coalesce(Subquery(count), 0)
+
+def rebuild_progress_counters():
+    """
+    Recounts the total and finished exercises of every day, week and workout plan from the exercises, and finishes
+    those whose exercises are all finished.
+
+    Flags are never cleared, a workout plan may have been finished by the user through `finish_workout_plan` before
+    all of its exercises were.
+    """
+    for model, parent_path in ((Day, 'day'), (Week, 'day__week'), (WorkoutPlan, 'day__week__workout_plan')):
+        model.objects.update(
+            total_exercises=_count_exercises(parent_path),
+            finished_exercises=_count_exercises(parent_path, finished=True))
+
+        # like record_finished_exercises, something without exercises is never finished
+        model.objects.filter(finished=False, total_exercises__gt=0, finished_exercises__gte=F('total_exercises')).update(finished=True)
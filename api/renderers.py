@@ -0,0 +1,37 @@
+"""
+Compact response formats offered next to JSON through content negotiation.
+
+MessagePack is rendered with the `msgpack` package pinned in requirements.txt. `MSGPACK_AVAILABLE` tells whether it
+could be imported, an install missing it only offers JSON, the renderer is left out of the REST_FRAMEWORK settings.
+Values that have no MessagePack type are encoded like the JSON renderer encodes them, dates as ISO 8601 strings.
+
+The workout plan snapshot endpoint is the one exception, it returns its stored JSON document as is and always
+answers JSON whatever the Accept header.
+"""
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    msgpack = None
+    MSGPACK_AVAILABLE = False
+
+# the encoder of the JSON renderer, it turns dates, uuids, decimals and lazy strings into JSON compatible values
+_encode_default = JSONEncoder().default
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    Renders responses as MessagePack, requested with 'Accept: application/msgpack' or '?format=msgpack'.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        return msgpack.packb(data, use_bin_type=True, default=_encode_default)
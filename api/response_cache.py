@@ -0,0 +1,126 @@
+"""
+A read-through cache of the workout plan listing responses.
+
+Entries are keyed by the listing and the id in its URL, and scoped to the workout plan they were read from: every
+plan has a namespace token in the cache and an entry is only served while it was stored under the current token.
+Invalidating a plan replaces its token, which drops every entry of the plan at once and leaves other plans untouched.
+Only the plan derived part of a response is cached, the person specific fields are added by the views.
+
+Tokens only reach the processes sharing the cache backend. Views that have already read the version of the plan, to
+build their ETag, pass it along and an entry stored for another version is never served, whatever backend holds it.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+import threading
+import uuid
+
+class PlanResponseCache():
+    """
+    A cache of listing payloads scoped per workout plan.
+
+    Attributes:
+        alias (str): The alias of the Django cache backend holding the entries, see the CACHES setting.
+        hits (int): The number of lookups served from the cache.
+        misses (int): The number of lookups that had to query the database.
+
+    Methods:
+        get: Returns the payload of a listing, building and storing it on a miss.
+        invalidate: Drops every entry of the given workout plans.
+        invalidate_on_commit: Drops every entry of the given workout plans once the current transaction commits.
+        clear: Drops every entry.
+        stats: Returns the hit/miss counters of the cache.
+    """
+
+    def __init__(self, alias):
+        self.alias = alias
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def _backend(self):
+        return caches[self.alias]
+
+    def _token_key(self, workout_plan_id):
+        return f'plan:{workout_plan_id}:token'
+
+    def _token(self, workout_plan_id):
+        token_key = self._token_key(workout_plan_id)
+        token = self._backend.get(token_key)
+        if token is None:
+            # a missing token, new or evicted, never matches an entry stored before
+            self._backend.add(token_key, uuid.uuid4().hex, timeout=None)
+            token = self._backend.get(token_key)
+        return token
+
+    def get(self, key, resolve, build, version=None):
+        """
+        Returns the payload cached under the key.
+
+        The workout plan of a listing never changes, so once an entry was stored for the key a miss reads the token
+        of its plan before building, without calling `resolve`. Without `resolve`, the first payload built for a key
+        is stored without a token, it only records the plan and is rebuilt by the next lookup.
+
+        Args:
+            key (str): The listing and the id it was requested for, e.g. 'days:12'.
+            resolve (callable): Called without arguments on a miss, returns the id of the workout plan the payload
+                is read from, or None if the requested object does not exist. None when `build` reads the workout
+                plan along with the payload, saving a query.
+            build (callable): Called without arguments on a miss, returns the payload or None if there is nothing
+                to cache. Without `resolve`, returns the id of the workout plan and the payload, or None.
+            version (int, optional): The current version of the workout plan, if the caller has read it. An entry
+                stored for another version is rebuilt.
+
+        Returns:
+            dict: The payload, None if `resolve` or `build` found nothing.
+        """
+        backend = self._backend
+        entry = backend.get(key)
+        workout_plan_id = None
+        if entry is not None:
+            workout_plan_id, token, entry_version, payload = entry
+            if entry_version == version and token == backend.get(self._token_key(workout_plan_id)):
+                with self._lock:
+                    self.hits += 1
+                return payload
+
+        with self._lock:
+            self.misses += 1
+
+        if workout_plan_id is None and resolve is not None:
+            workout_plan_id = resolve()
+            if workout_plan_id is None:
+                return None
+
+        # the token is read before the payload, so a write committed while building replaces it and the entry is
+        # never served
+        token = self._token(workout_plan_id) if workout_plan_id is not None else None
+        payload = build()
+        if resolve is None and payload is not None:
+            built_plan_id, payload = payload
+            if token is None:
+                # the plan is only known once the payload is read, a token read now could already belong to a
+                # write committed after the read, so the entry is stored with one that never matches
+                workout_plan_id, token = built_plan_id, ''
+        if payload is None:
+            return None
+
+        backend.set(key, (workout_plan_id, token, version, payload))
+        return payload
+
+    def invalidate(self, workout_plan_ids):
+        self._backend.delete_many([self._token_key(workout_plan_id) for workout_plan_id in set(workout_plan_ids)])
+
+    def invalidate_on_commit(self, workout_plan_ids):
+        workout_plan_ids = list(workout_plan_ids)
+        transaction.on_commit(lambda: self.invalidate(workout_plan_ids))
+
+    def clear(self):
+        self._backend.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+plan_responses = PlanResponseCache(getattr(settings, 'PLAN_RESPONSE_CACHE', 'default'))
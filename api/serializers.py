@@ -1,5 +1,7 @@
 from django.contrib.auth.models import User
 from .models import Exercise, Person, WorkoutPlan, User, WorkoutPlan, Week, Day, ExerciseSteps
+from datetime import datetime
+from django.db.models import Prefetch
 from rest_framework import serializers
 
 class PersonSerialize(serializers.ModelSerializer):
@@ -17,7 +19,7 @@ class UserSerializer(serializers.ModelSerializer):
 class WorkoutPlanSerializer(serializers.ModelSerializer):
     class Meta:
         model = WorkoutPlan
-        fields = '__all__'
+        exclude = ('change_seq',)
 
 class UserSerializer(serializers.ModelSerializer):
     workout_plans = WorkoutPlanSerializer(many=True, read_only=True)
@@ -26,29 +28,110 @@ class UserSerializer(serializers.ModelSerializer):
         model = User
         fields = ('__all__')
 
-class ExerciseSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = Exercise
-        fields = '__all__'
-
-class ExerciseStepsSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = ExerciseSteps
-        fields = '__all__'
-
 class WeekSerializer(serializers.ModelSerializer):
     class Meta:
         model = Week
-        fields = '__all__'
+        exclude = ('change_seq',)
 
 class DaySerializer(serializers.ModelSerializer):
     week = WeekSerializer()
     class Meta:
         model = Day
-        fields = '__all__'
+        exclude = ('change_seq',)
 
 class WorkoutPlanSerializer(serializers.ModelSerializer):
     days = DaySerializer(many=True, read_only=True)
     class Meta:
         model = WorkoutPlan
-        fields = '__all__'
\ No newline at end of file
+        exclude = ('change_seq',)
+
+    def __init__(self, *args, **kwargs):
+        # an optional subset of the fields to return, see list_user_workout_plans
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+
+        if fields is not None:
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
+
+# Lean read path of the listing views: rows are read with values() and returned in the same format as the
+# ModelSerializers above, without building a serializer for every row. Like the serializers, they leave out the
+# change_seq bookkeeping column of api.sync
+
+PLAN_FIELDS = ('id', 'person', 'name', 'number', 'started', 'finished', 'date_created', 'total_exercises', 'finished_exercises', 'version')
+WEEK_FIELDS = ('id', 'number', 'current_week', 'finished', 'date_created', 'total_exercises', 'finished_exercises', 'workout_plan')
+DAY_FIELDS = ('id', 'number', 'name', 'finished', 'total_exercises', 'finished_exercises')
+EXERCISE_FIELDS = ('id', 'name', 'description', 'finished', 'reps', 'sets', 'time_based', 'time', 'no_time_limit', 'link', 'version', 'day')
+
+_datetime_field = serializers.DateTimeField()
+
+def lean_rows(queryset, fields):
+    """
+    Returns the rows of a queryset as dictionaries.
+
+    Foreign keys are returned as ids under the name of the field and datetimes are formatted like `DateTimeField`.
+
+    Args:
+        queryset (QuerySet): The rows to read.
+        fields (tuple of str): The fields to read, in output order.
+
+    Returns:
+        list of dict: One dictionary per row.
+    """
+    rows = list(queryset.values(*fields))
+    if rows:
+        datetime_fields = [field for field, value in rows[0].items() if isinstance(value, datetime)]
+        for row in rows:
+            for field in datetime_fields:
+                row[field] = _datetime_field.to_representation(row[field])
+    return rows
+
+def prefetch_plan_tree(workout_plans):
+    """
+    Prefetches the weeks, days, exercises and steps of workout plans for `WorkoutPlanTreeSerializer`.
+
+    The tree is loaded with one query per level, whatever the size of the plans.
+
+    Args:
+        workout_plans (QuerySet): The workout plans to load.
+
+    Returns:
+        QuerySet: The workout plans with their tree prefetched.
+    """
+    return workout_plans.prefetch_related(
+        Prefetch('week_set', queryset=Week.objects.order_by('number')),
+        Prefetch('week_set__day_set', queryset=Day.objects.order_by('number')),
+        Prefetch('week_set__day_set__exercise_set', queryset=Exercise.objects.select_related('definition').order_by('id')),
+        Prefetch('week_set__day_set__exercise_set__definition__exercisesteps_set', queryset=ExerciseSteps.objects.order_by('id')),
+    )
+
+class ExerciseTreeSerializer(serializers.ModelSerializer):
+    steps = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Exercise
+        exclude = ('definition', 'change_seq')
+
+    def get_steps(self, exercise):
+        return [step.instruction for step in exercise.definition.exercisesteps_set.all()]
+
+class DayTreeSerializer(serializers.ModelSerializer):
+    exercises = ExerciseTreeSerializer(source='exercise_set', many=True, read_only=True)
+
+    class Meta:
+        model = Day
+        exclude = ('change_seq',)
+
+class WeekTreeSerializer(serializers.ModelSerializer):
+    days = DayTreeSerializer(source='day_set', many=True, read_only=True)
+
+    class Meta:
+        model = Week
+        exclude = ('change_seq',)
+
+class WorkoutPlanTreeSerializer(serializers.ModelSerializer):
+    weeks = WeekTreeSerializer(source='week_set', many=True, read_only=True)
+
+    class Meta:
+        model = WorkoutPlan
+        exclude = ('change_seq',)
@@ -0,0 +1,87 @@
+"""
+A process-wide cache of workout plan skeletons.
+
+A skeleton is the selection of days and exercises of a workout plan, see `Workout._select_plan_skeleton`.
+Plans with the same preferred days, sets, reps and number of weeks can share skeletons, so the cache keeps a
+small pool of randomly selected variants per key and hands out one of them at random once the pool is full.
+"""
+from collections import OrderedDict
+from django.conf import settings
+import random
+import threading
+
+def count_skeleton_exercises(skeleton):
+    """
+    Returns the number of exercises in a plan skeleton.
+    """
+    return sum(len(day_exercises) for week_days in skeleton for _, _, day_exercises in week_days)
+
+class PlanSkeletonCache():
+    """
+    A least recently used cache of plan skeleton pools.
+
+    Attributes:
+        max_keys (int): The number of keys kept before the least recently used one is evicted.
+        pool_size (int): The number of skeleton variants selected for each key.
+        hits (int): The number of lookups that were served from a full pool.
+        misses (int): The number of lookups that had to select a new skeleton.
+
+    Methods:
+        get: Returns a skeleton for a key, selecting a new one while the key's pool is not full.
+        clear: Removes every pool from the cache.
+        stats: Returns the size and hit/miss counters of the cache.
+    """
+
+    def __init__(self, max_keys, pool_size):
+        self.max_keys = max_keys
+        self.pool_size = pool_size
+        self.hits = 0
+        self.misses = 0
+        self._pools = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, select):
+        """
+        Returns a skeleton for the key.
+
+        Args:
+            key (tuple): The hashable inputs the skeleton depends on.
+            select (callable): Selects a new skeleton, called without arguments while the pool is not full.
+
+        Returns:
+            tuple: The immutable skeleton.
+        """
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is not None:
+                self._pools.move_to_end(key)
+                if len(pool) >= self.pool_size:
+                    self.hits += 1
+                    return random.choice(pool)
+
+        # Selecting happens outside of the lock, surplus skeletons of concurrent misses are not pooled
+        skeleton = select()
+
+        with self._lock:
+            self.misses += 1
+            pool = self._pools.setdefault(key, [])
+            self._pools.move_to_end(key)
+            if len(pool) < self.pool_size:
+                pool.append(skeleton)
+
+            while len(self._pools) > self.max_keys:
+                self._pools.popitem(last=False)
+
+        return skeleton
+
+    def clear(self):
+        with self._lock:
+            self._pools.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'keys': len(self._pools), 'hits': self.hits, 'misses': self.misses}
+
+plan_skeletons = PlanSkeletonCache(
+    max_keys=getattr(settings, 'PLAN_SKELETON_CACHE_SIZE', 256),
+    pool_size=getattr(settings, 'PLAN_SKELETON_POOL_SIZE', 16))
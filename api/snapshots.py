@@ -0,0 +1,207 @@
+"""
+Materialized JSON documents of workout plan trees.
+
+Every workout plan keeps the output of `WorkoutPlanTreeSerializer` split in two: a `WorkoutPlanSnapshot` holding the
+plan and its weeks, with the days of every week replaced by their ids, and one `DaySnapshot` per day holding the day
+and its exercises. Snapshots are written when plans are generated and patched in the transaction of every write to
+the plan. A write only re-reads the few columns it can change, of the days, weeks and exercises it touched, and only
+re-encodes the small plan document and the documents of those days. Readers get the stored documents with two
+queries and join them as strings.
+
+Plans generated before snapshots existed are backfilled with the rebuild_plan_snapshots command. Until then their
+tree is serialized on every read, reads never write.
+"""
+from django.db.models import Q
+from .models import Day, DaySnapshot, Exercise, Week, WorkoutPlan, WorkoutPlanSnapshot
+from .serializers import WorkoutPlanTreeSerializer, prefetch_plan_tree
+import json
+
+# The columns the write endpoints change, everything else in a document is fixed once the plan is generated
+PLAN_PATCHED_FIELDS = ('started', 'finished', 'finished_exercises', 'version')
+WEEK_PATCHED_FIELDS = ('current_week', 'finished', 'finished_exercises')
+DAY_PATCHED_FIELDS = ('finished', 'finished_exercises')
+EXERCISE_PATCHED_FIELDS = ('finished', 'reps', 'sets', 'version')
+
+def dump_document(data):
+    return json.dumps(data, separators=(',', ':'))
+
+def _embed(document, key, items):
+    """
+    Adds a list of already encoded JSON documents under a key of an encoded JSON object, without decoding them.
+    """
+    return f'{document[:-1]},{json.dumps(key)}:[{",".join(items)}]}}'
+
+def build_plan_documents(workout_plan_ids):
+    """
+    Serializes the trees of workout plans, with one query per level of the tree.
+
+    Returns:
+        dict: The JSON document of every existing workout plan keyed by its id.
+    """
+    workout_plans = prefetch_plan_tree(WorkoutPlan.objects.filter(id__in=workout_plan_ids))
+    return {workout_plan.id: dump_document(WorkoutPlanTreeSerializer(workout_plan).data) for workout_plan in workout_plans}
+
+def split_plan_document(document):
+    """
+    Splits the JSON document of a workout plan tree into the document of the plan and the documents of its days.
+
+    Returns:
+        tuple: The plan document, with the days of every week replaced by their ids, and the day documents keyed by
+        day id.
+    """
+    plan = json.loads(document)
+    day_documents = {}
+    for week in plan['weeks']:
+        for day in week['days']:
+            day_documents[day['id']] = dump_document(day)
+        week['days'] = [day['id'] for day in week['days']]
+
+    return dump_document(plan), day_documents
+
+def join_plan_document(plan_document, day_documents):
+    """
+    Joins the documents of a workout plan and of its days back into the JSON document of its tree.
+
+    Only the plan document is decoded, the day documents are embedded as they are.
+
+    Returns:
+        str: The JSON document of the tree, None if a day document is missing.
+    """
+    plan = json.loads(plan_document)
+    weeks = []
+    for week in plan.pop('weeks'):
+        day_ids = week.pop('days')
+        if any(day_id not in day_documents for day_id in day_ids):
+            return None
+        weeks.append(_embed(dump_document(week), 'days', [day_documents[day_id] for day_id in day_ids]))
+
+    return _embed(dump_document(plan), 'weeks', weeks)
+
+def write_plan_snapshots(workout_plan_ids):
+    """
+    Writes the snapshots of workout plans from scratch, replacing existing ones.
+
+    Returns:
+        int: The number of snapshots written.
+    """
+    documents = build_plan_documents(workout_plan_ids)
+
+    plan_snapshots, day_snapshots = [], []
+    for workout_plan_id, document in documents.items():
+        plan_document, day_documents = split_plan_document(document)
+        plan_snapshots.append(WorkoutPlanSnapshot(workout_plan_id=workout_plan_id, document=plan_document))
+        day_snapshots += [
+            DaySnapshot(day_id=day_id, workout_plan_id=workout_plan_id, document=day_document)
+            for day_id, day_document in day_documents.items()]
+
+    WorkoutPlanSnapshot.objects.filter(workout_plan__in=documents).delete()
+    DaySnapshot.objects.filter(workout_plan__in=documents).delete()
+    WorkoutPlanSnapshot.objects.bulk_create(plan_snapshots)
+    DaySnapshot.objects.bulk_create(day_snapshots)
+    return len(documents)
+
+def patch_plan_snapshot(workout_plan_id, exercise_ids=()):
+    """
+    Copies the changed columns of a workout plan, and of the given exercises with their days and weeks, into its
+    snapshot.
+
+    Finishing a week moves the current week flag to the next week, so the current week is patched as well. Must run
+    in the transaction of the write, after it. A plan without a snapshot is left alone until it is rebuilt.
+
+    Args:
+        workout_plan_id (int): The id of the workout plan that was written to.
+        exercise_ids (iterable of int, optional): The ids of the exercises that were written to.
+    """
+    snapshot = WorkoutPlanSnapshot.objects.select_for_update().filter(workout_plan=workout_plan_id).first()
+    if not snapshot:
+        return
+
+    exercise_values = {}
+    if exercise_ids:
+        exercises = Exercise.objects.filter(id__in=list(exercise_ids), day__week__workout_plan=workout_plan_id)
+        exercise_values = {exercise.pop('id'): exercise for exercise in exercises.values('id', 'day', *EXERCISE_PATCHED_FIELDS)}
+
+    day_ids = {exercise.pop('day') for exercise in exercise_values.values()}
+    day_values = {day.pop('id'): day for day in Day.objects.filter(id__in=day_ids).values('id', 'week', *DAY_PATCHED_FIELDS)}
+
+    week_ids = {day.pop('week') for day in day_values.values()}
+    weeks = Week.objects.filter(Q(id__in=week_ids) | Q(current_week=True), workout_plan=workout_plan_id)
+    week_values = {week.pop('id'): week for week in weeks.values('id', *WEEK_PATCHED_FIELDS)}
+
+    plan_document = json.loads(snapshot.document)
+    plan_document.update(WorkoutPlan.objects.filter(id=workout_plan_id).values(*PLAN_PATCHED_FIELDS).first())
+    for week in plan_document['weeks']:
+        week.update(week_values.get(week['id'], {}))
+    snapshot.document = dump_document(plan_document)
+    snapshot.save()
+
+    day_snapshots = list(DaySnapshot.objects.select_for_update().filter(day__in=day_values))
+    for day_snapshot in day_snapshots:
+        day_document = json.loads(day_snapshot.document)
+        day_document.update(day_values[day_snapshot.day_id])
+        for exercise in day_document['exercises']:
+            exercise.update(exercise_values.get(exercise['id'], {}))
+        day_snapshot.document = dump_document(day_document)
+    DaySnapshot.objects.bulk_update(day_snapshots, ['document'])
+
+def _read_day_documents(workout_plan_ids):
+    day_documents = {}
+    for workout_plan_id, day_id, document in DaySnapshot.objects.filter(workout_plan__in=workout_plan_ids).values_list('workout_plan', 'day', 'document'):
+        day_documents.setdefault(workout_plan_id, {})[day_id] = document
+    return day_documents
+
+def read_plan_snapshot(workout_plan_id, person):
+    """
+    Returns the JSON document of a workout plan of the person.
+
+    The tree of a plan without a complete snapshot is serialized instead, without storing it.
+
+    Returns:
+        str: The JSON document, None if the person has no such workout plan.
+    """
+    plan_document = WorkoutPlanSnapshot.objects.filter(
+        workout_plan=workout_plan_id, workout_plan__person=person).values_list('document', flat=True).first()
+    if plan_document is not None:
+        document = join_plan_document(plan_document, _read_day_documents([workout_plan_id]).get(workout_plan_id, {}))
+        if document is not None:
+            return document
+
+    if not WorkoutPlan.objects.filter(id=workout_plan_id, person=person).exists():
+        return None
+
+    return build_plan_documents([workout_plan_id]).get(workout_plan_id)
+
+def find_stale_snapshots(workout_plan_ids=None, batch_size=200):
+    """
+    Compares the snapshots of workout plans with freshly serialized trees.
+
+    Args:
+        workout_plan_ids (list of int, optional): The workout plans to check, every plan when None.
+        batch_size (int, optional): The number of plans serialized at once.
+
+    Returns:
+        tuple: The lists of ids of the plans whose snapshot is missing or incomplete and whose snapshot differs from
+        their tree.
+    """
+    workout_plans = WorkoutPlan.objects.order_by('id')
+    if workout_plan_ids is not None:
+        workout_plans = workout_plans.filter(id__in=workout_plan_ids)
+    ids = list(workout_plans.values_list('id', flat=True))
+
+    missing, stale = [], []
+    for start in range(0, len(ids), batch_size):
+        batch = ids[start:start + batch_size]
+        documents = build_plan_documents(batch)
+        plan_documents = dict(WorkoutPlanSnapshot.objects.filter(workout_plan__in=batch).values_list('workout_plan', 'document'))
+        day_documents = _read_day_documents(batch)
+        for workout_plan_id in batch:
+            snapshot = None
+            if workout_plan_id in plan_documents:
+                snapshot = join_plan_document(plan_documents[workout_plan_id], day_documents.get(workout_plan_id, {}))
+
+            if snapshot is None:
+                missing.append(workout_plan_id)
+            elif json.loads(snapshot) != json.loads(documents[workout_plan_id]):
+                stale.append(workout_plan_id)
+
+    return missing, stale
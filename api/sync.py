@@ -0,0 +1,95 @@
+"""
+Change sequence numbers and the delta reads of the offline sync endpoint.
+
+Every write to a workout plan, week, day or exercise stamps the rows it changes with one number taken from the
+`ChangeSequence` row of the person owning them. The counter is incremented with an UPDATE, so its row stays locked
+until the writing transaction commits and the numbers of a person are handed out in commit order, while writes for
+different persons never wait on each other. A client that has seen every change of its person up to a number, its
+cursor, catches up by reading the rows stamped with a higher number. The numbers are only ordered within a person, so
+every model is indexed on its owner and `change_seq`: plans on (person, change_seq), and weeks, days and exercises on
+their parent and `change_seq`, each delta only reads the changed rows below the rows of the person.
+"""
+from django.db.models import F, Max
+from .models import ChangeSequence, Day, Exercise, Week, WorkoutPlan
+from .serializers import DAY_FIELDS, EXERCISE_FIELDS, PLAN_FIELDS, WEEK_FIELDS, lean_rows
+
+def _create_missing_sequences(person_ids):
+    """
+    Creates the sequences of persons that have none, starting after the highest number their plans are stamped with.
+    """
+    existing = set(ChangeSequence.objects.filter(person__in=person_ids).values_list('person', flat=True))
+    missing = set(person_ids) - existing
+    if not missing:
+        return
+
+    # every write stamps the plan it changes, so no row of a person has a higher number than their plans
+    latest_values = dict(
+        WorkoutPlan.objects.filter(person__in=missing)
+        .values_list('person')
+        .annotate(Max('change_seq')))
+
+    # a sequence created concurrently already starts at the same number
+    ChangeSequence.objects.bulk_create(
+        [ChangeSequence(person_id=person_id, value=latest_values.get(person_id, 0)) for person_id in missing],
+        ignore_conflicts=True)
+
+def next_change_seqs(person_ids):
+    """
+    Takes the next change sequence number of every person. Must run in the transaction of the write it stamps.
+
+    Args:
+        person_ids (iterable of int): The ids of the persons whose rows are written to.
+
+    Returns:
+        dict: The change sequence number of every person keyed by person id.
+    """
+    person_ids = set(person_ids)
+    if not person_ids:
+        return {}
+
+    _create_missing_sequences(person_ids)
+    ChangeSequence.objects.filter(person__in=person_ids).update(value=F('value') + 1)
+    return dict(ChangeSequence.objects.filter(person__in=person_ids).values_list('person', 'value'))
+
+def next_change_seq(person_id):
+    """
+    Takes the next change sequence number of a person. Must run in the transaction of the write it stamps, and is
+    taken once per transaction, every row the transaction changes is stamped with it.
+    """
+    return next_change_seqs([person_id])[person_id]
+
+def current_change_seq(person):
+    """
+    Returns the last change sequence number handed out for a person, every change of theirs up to it has been
+    committed.
+    """
+    return ChangeSequence.objects.filter(person=person).values_list('value', flat=True).first() or 0
+
+def read_changes(person, cursor=None):
+    """
+    Reads the workout plans, weeks, days and exercises of a person that changed after a cursor.
+
+    Args:
+        person (Person): The person whose rows are read.
+        cursor (int, optional): The change sequence number the client has seen every change up to, every row is read
+            when it is None.
+
+    Returns:
+        dict: The new cursor and the changed rows of every model.
+    """
+    latest = current_change_seq(person)
+    change_range = {'change_seq__lte': latest}
+    if cursor is not None:
+        change_range['change_seq__gt'] = cursor
+
+    def changed(model, person_path, fields):
+        rows = model.objects.filter(**change_range, **{person_path: person}).order_by('id')
+        return lean_rows(rows, fields)
+
+    return {
+        'cursor': latest,
+        'workoutPlans': changed(WorkoutPlan, 'person', PLAN_FIELDS),
+        'weeks': changed(Week, 'workout_plan__person', WEEK_FIELDS),
+        'days': changed(Day, 'week__workout_plan__person', DAY_FIELDS + ('week',)),
+        'exercises': changed(Exercise, 'day__week__workout_plan__person', EXERCISE_FIELDS),
+    }
@@ -1,3 +1,763 @@
-from django.test import TestCase
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import OperationalError, connection
+from django.db.models import F
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from .authentication import identity_cache
+from .hashing import password_hasher
+from .middleware import CompressionMiddleware
+from .models import Day, DaySnapshot, Exercise, IdempotencyKey, Person, PlanGenerationJob, Week, WorkoutPlan, WorkoutPlanSnapshot
+from .operations import write_exercise
+from .renderers import MessagePackRenderer
+from .progress import rebuild_progress_counters
+from .response_cache import plan_responses
+from .tokens import issue_access_token
+from .utils import Workout
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+import gzip
+import json
+import msgpack
+import tempfile
+import threading
+import time
 
-# Create your tests here.
+class WorkoutPlanTreeTests(TestCase):
+
+    def setUp(self):
+        identity_cache.clear()
+        user = User.objects.create(username='tester')
+        self.person = Person.objects.create(user=user, hashed_id='tester-hash', gender='male', height=1.8, weight=75)
+        self.client = APIClient()
+
+    def get_tree(self, workout_plan):
+        return self.client.get(f'/api/workout-plans/{workout_plan.id}/{self.person.hashed_id}/tree/')
+
+    def test_tree_contains_every_exercise_and_step(self):
+        workout_plan = Workout().generate_workout_plan(self.person, ['Monday', 'Wednesday'])
+
+        response = self.get_tree(workout_plan)
+
+        self.assertEqual(response.status_code, 200)
+        weeks = response.data['data']['weeks']
+        exercises = [exercise for week in weeks for day in week['days'] for exercise in day['exercises']]
+        self.assertEqual(len(exercises), Exercise.objects.filter(day__week__workout_plan=workout_plan).count())
+        self.assertTrue(all(exercise['steps'] for exercise in exercises))
+
+    def test_query_count_does_not_depend_on_plan_size(self):
+        small_plan = Workout().generate_workout_plan(self.person, ['Monday'])
+        large_plan = Workout().generate_workout_plan(self.person, ['Monday', 'Tuesday', 'Thursday', 'Friday', 'Saturday'])
+
+        # person, plan, weeks, days, exercises with their definitions and steps
+        for workout_plan in (small_plan, large_plan):
+            identity_cache.clear()
+            with self.assertNumQueries(6):
+                response = self.get_tree(workout_plan)
+            self.assertEqual(response.status_code, 200)
+
+    def test_other_persons_plan_is_not_found(self):
+        other_user = User.objects.create(username='other')
+        other_person = Person.objects.create(user=other_user, hashed_id='other-hash', gender='female', height=1.6, weight=55)
+        workout_plan = Workout().generate_workout_plan(other_person, ['Monday'])
+
+        response = self.get_tree(workout_plan)
+
+        self.assertEqual(response.status_code, 404)
+
+class WorkoutPlanListTests(TestCase):
+
+    def setUp(self):
+        identity_cache.clear()
+        user = User.objects.create(username='tester')
+        self.person = Person.objects.create(user=user, hashed_id='tester-hash', gender='male', height=1.8, weight=75)
+        self.client = APIClient()
+        for number in range(1, 21):
+            WorkoutPlan.objects.create(person=self.person, name=f'Plan {number}', number=number)
+
+    def list_plans(self, url=None, **headers):
+        return self.client.get(url or f'/api/workout-plans/list/{self.person.hashed_id}/', **headers)
+
+    def test_pages_are_followed_with_the_cursor(self):
+        first = self.list_plans(f'/api/workout-plans/list/{self.person.hashed_id}/?pageSize=15')
+        second = self.list_plans(first.data['next'])
+
+        self.assertEqual(first.status_code, 200)
+        self.assertIsNone(first.data['previous'])
+        self.assertIsNone(second.data['next'])
+        numbers = [plan['number'] for plan in first.data['data'] + second.data['data']]
+        self.assertEqual(numbers, list(range(1, 21)))
+
+    def test_fields_select_the_returned_fields(self):
+        response = self.list_plans(f'/api/workout-plans/list/{self.person.hashed_id}/?fields=id,name')
+        unknown = self.list_plans(f'/api/workout-plans/list/{self.person.hashed_id}/?fields=id,secret')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data['data'][0]), {'id', 'name'})
+        self.assertEqual(unknown.status_code, 400)
+
+    def test_unchanged_page_is_not_modified(self):
+        etag = self.list_plans()['ETag']
+
+        response = self.list_plans(HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_written_plan_changes_the_etag(self):
+        etag = self.list_plans()['ETag']
+        WorkoutPlan.objects.filter(person=self.person, number=1).update(version=F('version') + 1)
+
+        response = self.list_plans(HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_plan_created_after_a_full_page_changes_the_etag(self):
+        first = self.list_plans()
+        WorkoutPlan.objects.create(person=self.person, name='Plan 21', number=21)
+
+        response = self.list_plans(HTTP_IF_NONE_MATCH=first['ETag'])
+
+        self.assertIsNone(first.data['next'])
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(response.data['next'])
+
+class IdentityCacheTests(TestCase):
+
+    def setUp(self):
+        identity_cache.clear()
+        user = User.objects.create(username='tester')
+        self.person = Person.objects.create(user=user, hashed_id='tester-hash', gender='male', height=1.8, weight=75)
+
+    def test_every_lookup_gets_its_own_person_and_user(self):
+        first = identity_cache.get(self.person.hashed_id)
+        first.user.username = 'changed'
+        first.weight = 100
+
+        second = identity_cache.get(self.person.hashed_id)
+
+        self.assertIsNot(second.user, first.user)
+        self.assertEqual(second.user.username, 'tester')
+        self.assertEqual(second.weight, 75)
+
+    def test_plan_generation_reads_the_current_biometrics(self):
+        identity_cache.get(self.person.hashed_id)
+        # changed through another process, whose invalidation does not reach this cache
+        Person.objects.filter(id=self.person.id).update(weight=150)
+
+        response = APIClient().post('/api/workout-plans/create/', {'X-User-Id': self.person.hashed_id, 'preferredDays': ['Monday']}, format='json')
+
+        # a bmi of 46 gets 5 sets where the cached bmi of 23 gets 4
+        self.assertEqual(response.status_code, 201)
+        sets = Exercise.objects.filter(day__week__workout_plan__person=self.person, time_based=False).values_list('sets', flat=True)
+        self.assertEqual(set(sets), {5})
+
+@override_settings(ACCESS_TOKEN_REQUIRED=True)
+class AccessTokenRequiredTests(TestCase):
+
+    def setUp(self):
+        identity_cache.clear()
+        user = User.objects.create(username='tester')
+        self.person = Person.objects.create(user=user, hashed_id='tester-hash', gender='male', height=1.8, weight=75)
+        self.client = APIClient()
+        WorkoutPlan.objects.create(person=self.person, name='1/4 CHALLENGE', number=1)
+        self.url = f'/api/workout-plans/list/{self.person.hashed_id}/'
+
+    def test_bare_hashed_id_is_refused(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 401)
+
+    def test_hashed_id_with_its_access_token_is_accepted(self):
+        response = self.client.get(self.url, HTTP_AUTHORIZATION=f'Bearer {issue_access_token(self.person)}')
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_access_token_of_another_person_is_refused(self):
+        other_user = User.objects.create(username='other')
+        other_person = Person.objects.create(user=other_user, hashed_id='other-hash', gender='female', height=1.6, weight=55)
+
+        response = self.client.get(self.url, HTTP_AUTHORIZATION=f'Bearer {issue_access_token(other_person)}')
+
+        self.assertEqual(response.status_code, 401)
+
+class WorkoutPlanCreationTests(TestCase):
+
+    def setUp(self):
+        identity_cache.clear()
+        user = User.objects.create(username='tester')
+        self.person = Person.objects.create(user=user, hashed_id='tester-hash', gender='male', height=1.8, weight=75)
+        self.client = APIClient()
+
+    def test_plan_that_cannot_be_generated_is_reported(self):
+        response = self.client.post('/api/workout-plans/create/', {'X-User-Id': self.person.hashed_id, 'preferredDays': []}, format='json')
+
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(WorkoutPlan.objects.filter(person=self.person).exists())
+
+    @override_settings(COHORT_REQUEST_MAX_MEMBERS=1)
+    def test_large_cohort_is_refused(self):
+        User.objects.filter(id=self.person.user_id).update(is_staff=True)
+        members = [{'hashedId': self.person.hashed_id, 'preferredDays': ['Monday']}] * 2
+
+        response = self.client.post('/api/workout-plans/cohort/', {'X-User-Id': self.person.hashed_id, 'members': members}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(WorkoutPlan.objects.filter(person=self.person).exists())
+
+    def test_job_lost_by_a_restarted_process_is_reported_as_failed(self):
+        job = PlanGenerationJob.objects.create(person=self.person, preferred_days=['Monday'], status=PlanGenerationJob.RUNNING)
+        PlanGenerationJob.objects.filter(id=job.id).update(date_created=timezone.now() - timedelta(hours=1))
+
+        response = self.client.get(f'/api/workout-plans/jobs/{job.id}/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], PlanGenerationJob.FAILED)
+
+class ProgressCounterTests(TestCase):
+
+    def setUp(self):
+        identity_cache.clear()
+        user = User.objects.create(username='tester')
+        self.person = Person.objects.create(user=user, hashed_id='tester-hash', gender='male', height=1.8, weight=75)
+        self.workout_plan = Workout().generate_workout_plan(self.person, ['Monday'])
+
+    def test_rebuild_finishes_days_whose_exercises_are_finished(self):
+        day = Day.objects.filter(week__workout_plan=self.workout_plan).order_by('id').first()
+        Exercise.objects.filter(day=day).update(finished=True)
+        Day.objects.filter(week__workout_plan=self.workout_plan).update(finished=False, finished_exercises=0)
+
+        rebuild_progress_counters()
+
+        day.refresh_from_db()
+        self.assertTrue(day.finished)
+        self.assertEqual(day.finished_exercises, day.total_exercises)
+
+    def test_rebuild_keeps_a_plan_finished_by_the_user(self):
+        self.client = APIClient()
+        self.client.put('/api/workout-plans/finish/', {'X-User-Id': self.person.hashed_id, 'workout_plan_id': self.workout_plan.id}, format='json')
+
+        rebuild_progress_counters()
+
+        self.workout_plan.refresh_from_db()
+        self.assertTrue(self.workout_plan.finished)
+        self.assertLess(self.workout_plan.finished_exercises, self.workout_plan.total_exercises)
+
+class ExerciseBatchTests(TestCase):
+
+    def setUp(self):
+        identity_cache.clear()
+        user = User.objects.create(username='tester')
+        self.person = Person.objects.create(user=user, hashed_id='tester-hash', gender='male', height=1.8, weight=75)
+        self.client = APIClient()
+        self.workout_plan = Workout().generate_workout_plan(self.person, ['Monday', 'Wednesday'])
+        self.day = Day.objects.filter(week__workout_plan=self.workout_plan).order_by('id').first()
+        self.exercises = list(Exercise.objects.filter(day=self.day).order_by('id'))
+
+    def batch(self, operations):
+        return self.client.put('/api/exercise/batch/', {'X-User-Id': self.person.hashed_id, 'operations': operations}, format='json')
+
+    def test_other_persons_exercise_is_not_found_and_nothing_is_written(self):
+        other_user = User.objects.create(username='other')
+        other_person = Person.objects.create(user=other_user, hashed_id='other-hash', gender='female', height=1.6, weight=55)
+        other_plan = Workout().generate_workout_plan(other_person, ['Monday'])
+        other_exercise = Exercise.objects.filter(day__week__workout_plan=other_plan).first()
+        exercise = self.exercises[0]
+
+        response = self.batch([
+            {'exercise_id': exercise.id, 'action': 'reps', 'value': 99},
+            {'exercise_id': other_exercise.id, 'action': 'finish'},
+        ])
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.data['exerciseIds'], [other_exercise.id])
+        exercise.refresh_from_db()
+        other_exercise.refresh_from_db()
+        self.assertEqual((exercise.reps, exercise.version), (self.exercises[0].reps, 1))
+        self.assertFalse(other_exercise.finished)
+
+    def test_mixed_batch_counts_every_finished_exercise_once(self):
+        first, second = self.exercises[:2]
+
+        response = self.batch([
+            {'exercise_id': first.id, 'action': 'finish'},
+            {'exercise_id': first.id, 'action': 'finish'},
+            {'exercise_id': second.id, 'action': 'sets', 'value': 99},
+            {'exercise_id': second.id, 'action': 'finish'},
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated'], 2)
+        self.day.refresh_from_db()
+        week = Week.objects.get(id=self.day.week_id)
+        self.workout_plan.refresh_from_db()
+        self.assertEqual(self.day.finished_exercises, 2)
+        self.assertEqual(week.finished_exercises, 2)
+        self.assertEqual(self.workout_plan.finished_exercises, 2)
+        self.assertEqual(set(Exercise.objects.filter(id__in=[first.id, second.id]).values_list('version', flat=True)), {2})
+
+    def test_finishing_a_finished_exercise_changes_nothing(self):
+        exercise = self.exercises[0]
+        self.batch([{'exercise_id': exercise.id, 'action': 'finish'}])
+        self.workout_plan.refresh_from_db()
+        plan_version = self.workout_plan.version
+
+        response = self.batch([{'exercise_id': exercise.id, 'action': 'finish'}])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated'], 0)
+        exercise.refresh_from_db()
+        self.workout_plan.refresh_from_db()
+        self.assertEqual(exercise.version, 2)
+        self.assertEqual(self.workout_plan.version, plan_version)
+        self.assertEqual(self.workout_plan.finished_exercises, 1)
+
+class OptimisticWriteTests(TestCase):
+
+    def setUp(self):
+        identity_cache.clear()
+        user = User.objects.create(username='tester')
+        self.person = Person.objects.create(user=user, hashed_id='tester-hash', gender='male', height=1.8, weight=75)
+        self.client = APIClient()
+        self.workout_plan = Workout().generate_workout_plan(self.person, ['Monday'])
+        self.exercises = list(Exercise.objects.filter(day__week__workout_plan=self.workout_plan).order_by('id')[:2])
+
+    def put(self, url, body):
+        return self.client.put(url, dict(body, **{'X-User-Id': self.person.hashed_id}), format='json')
+
+    def test_write_against_a_stale_version_is_refused(self):
+        exercise = self.exercises[0]
+        self.put('/api/exercise/reps/', {'exercise_id': exercise.id, 'reps': 20, 'version': 1})
+
+        response = self.put('/api/exercise/reps/', {'exercise_id': exercise.id, 'reps': 30, 'version': 1})
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['version'], 2)
+        exercise.refresh_from_db()
+        self.assertEqual(exercise.reps, 20)
+
+    def test_write_without_a_version_applies_to_the_version_read_by_the_request(self):
+        exercise = self.exercises[0]
+
+        def write_after_a_concurrent_write(exercise, expected_version, **changes):
+            # another request writes the exercise between this request reading it and writing it
+            Exercise.objects.filter(id=exercise.id).update(sets=9, version=F('version') + 1)
+            return write_exercise(exercise, expected_version, **changes)
+
+        with mock.patch('api.views.write_exercise', write_after_a_concurrent_write):
+            response = self.put('/api/exercise/sets/', {'exercise_id': exercise.id, 'sets': 2})
+
+        self.assertEqual(response.status_code, 409)
+        exercise.refresh_from_db()
+        self.assertEqual((exercise.sets, exercise.version), (9, 2))
+
+    def test_finishing_a_changed_workout_plan_is_refused(self):
+        stale_version = self.workout_plan.version
+        self.put('/api/exercise/finish/', {'exercise_id': self.exercises[0].id})
+
+        response = self.put('/api/workout-plans/finish/', {'workout_plan_id': self.workout_plan.id, 'version': stale_version})
+
+        self.workout_plan.refresh_from_db()
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['version'], self.workout_plan.version)
+        self.assertFalse(self.workout_plan.finished)
+
+    def test_conflicting_batch_operation_writes_nothing(self):
+        first, second = self.exercises
+        self.put('/api/exercise/reps/', {'exercise_id': second.id, 'reps': 20})
+
+        response = self.put('/api/exercise/batch/', {'operations': [
+            {'exercise_id': first.id, 'action': 'finish'},
+            {'exercise_id': second.id, 'action': 'reps', 'value': 30, 'version': 1},
+        ]})
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['exerciseIds'], [second.id])
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertFalse(first.finished)
+        self.assertEqual((second.reps, second.version), (20, 2))
+
+class SyncTests(TestCase):
+
+    def setUp(self):
+        identity_cache.clear()
+        user = User.objects.create(username='tester')
+        self.person = Person.objects.create(user=user, hashed_id='tester-hash', gender='male', height=1.8, weight=75)
+        self.client = APIClient()
+        self.workout_plan = Workout().generate_workout_plan(self.person, ['Monday', 'Wednesday'])
+
+    def sync(self, cursor=None, operations=()):
+        body = {'X-User-Id': self.person.hashed_id, 'operations': list(operations)}
+        if cursor is not None:
+            body['cursor'] = cursor
+        response = self.client.post('/api/sync/', body, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_first_sync_reads_every_row(self):
+        changes = self.sync()
+
+        self.assertEqual([plan['id'] for plan in changes['workoutPlans']], [self.workout_plan.id])
+        self.assertEqual(len(changes['weeks']), Week.objects.filter(workout_plan=self.workout_plan).count())
+        self.assertEqual(len(changes['days']), Day.objects.filter(week__workout_plan=self.workout_plan).count())
+        self.assertEqual(len(changes['exercises']), Exercise.objects.filter(day__week__workout_plan=self.workout_plan).count())
+
+    def test_sync_after_a_cursor_reads_only_the_changed_rows(self):
+        cursor = self.sync()['cursor']
+        exercise = Exercise.objects.filter(day__week__workout_plan=self.workout_plan).order_by('id').first()
+
+        changes = self.sync(cursor, [{'exercise_id': exercise.id, 'action': 'finish'}])
+
+        self.assertGreater(changes['cursor'], cursor)
+        self.assertEqual([row['id'] for row in changes['exercises']], [exercise.id])
+        self.assertEqual([row['id'] for row in changes['days']], [exercise.day_id])
+        self.assertEqual([row['id'] for row in changes['weeks']], [exercise.day.week_id])
+        self.assertEqual([row['id'] for row in changes['workoutPlans']], [self.workout_plan.id])
+
+        unchanged = self.sync(changes['cursor'])
+        self.assertEqual(unchanged['cursor'], changes['cursor'])
+        self.assertEqual((unchanged['workoutPlans'], unchanged['weeks'], unchanged['days'], unchanged['exercises']), ([], [], [], []))
+
+    def test_changes_of_other_persons_do_not_advance_the_cursor(self):
+        cursor = self.sync()['cursor']
+        other_user = User.objects.create(username='other')
+        other_person = Person.objects.create(user=other_user, hashed_id='other-hash', gender='female', height=1.6, weight=55)
+
+        Workout().generate_workout_plan(other_person, ['Monday'])
+
+        changes = self.sync(cursor)
+        self.assertEqual(changes['cursor'], cursor)
+        self.assertEqual(changes['workoutPlans'], [])
+
+class WorkoutPlanSnapshotTests(TestCase):
+
+    def setUp(self):
+        identity_cache.clear()
+        user = User.objects.create(username='tester')
+        self.person = Person.objects.create(user=user, hashed_id='tester-hash', gender='male', height=1.8, weight=75)
+        self.client = APIClient()
+        self.workout_plan = Workout().generate_workout_plan(self.person, ['Monday', 'Wednesday'])
+
+    def get_document(self, view):
+        response = self.client.get(f'/api/workout-plans/{self.workout_plan.id}/{self.person.hashed_id}/{view}/')
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def test_patched_snapshot_matches_the_tree(self):
+        week = self.workout_plan.week_set.order_by('number').first()
+        for exercise in Exercise.objects.filter(day__week=week):
+            self.client.put('/api/exercise/finish/', {'X-User-Id': self.person.hashed_id, 'exercise_id': exercise.id}, format='json')
+
+        self.assertEqual(self.get_document('snapshot'), self.get_document('tree'))
+
+    def test_missing_snapshot_is_served_without_writing_it(self):
+        WorkoutPlanSnapshot.objects.all().delete()
+        DaySnapshot.objects.all().delete()
+
+        document = self.get_document('snapshot')
+
+        self.assertEqual(document, self.get_document('tree'))
+        self.assertFalse(WorkoutPlanSnapshot.objects.exists())
+
+class PlanResponseCacheTests(TestCase):
+
+    def setUp(self):
+        identity_cache.clear()
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache_dir.cleanup)
+        caches_setting = {
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'plan-responses': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': self.cache_dir.name},
+        }
+        overridden = override_settings(CACHES=caches_setting)
+        overridden.enable()
+        self.addCleanup(overridden.disable)
+
+        user = User.objects.create(username='tester')
+        self.person = Person.objects.create(user=user, hashed_id='tester-hash', gender='male', height=1.8, weight=75)
+        self.client = APIClient()
+        self.workout_plan = Workout().generate_workout_plan(self.person, ['Monday', 'Wednesday'])
+        self.day = Day.objects.filter(week__workout_plan=self.workout_plan).order_by('id').first()
+
+    def list_exercises(self):
+        return self.client.get(f'/api/workout-plans/week/day/{self.day.id}/{self.person.hashed_id}/exercises/list/')
+
+    def test_listing_is_served_from_the_cache(self):
+        # the first listing only records the plan of the day, the second one is cached
+        first = self.list_exercises()
+        self.list_exercises()
+        # the person is served by the identity cache and the exercises by the response cache
+        with self.assertNumQueries(0):
+            cached = self.list_exercises()
+
+        self.assertEqual(cached.status_code, 200)
+        self.assertEqual(cached.data, first.data)
+
+    def test_missed_listing_reads_the_exercises_and_their_steps(self):
+        first = self.list_exercises()
+
+        plan_responses.clear()
+        with self.assertNumQueries(2):
+            cold = self.list_exercises()
+
+        plan_responses.invalidate([self.workout_plan.id])
+        with self.assertNumQueries(2):
+            invalidated = self.list_exercises()
+
+        self.assertEqual(cold.data, first.data)
+        self.assertEqual(invalidated.data, first.data)
+
+    def test_finishing_an_exercise_drops_the_plans_entries(self):
+        self.list_exercises()
+        exercise = Exercise.objects.filter(day=self.day).first()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put('/api/exercise/finish/', {'X-User-Id': self.person.hashed_id, 'exercise_id': exercise.id}, format='json')
+
+        misses = plan_responses.stats()['misses']
+        response = self.list_exercises()
+
+        self.assertEqual(plan_responses.stats()['misses'], misses + 1)
+        finished = {row['id']: row['finished'] for row in response.data['data']}
+        self.assertTrue(finished[exercise.id])
+
+    def test_week_listing_of_another_version_is_rebuilt(self):
+        url = f'/api/workout-plans/{self.workout_plan.id}/{self.person.hashed_id}/week/list/'
+        first = self.client.get(url)
+        # a write made by another process, whose invalidation never reached this one
+        Week.objects.filter(workout_plan=self.workout_plan).update(finished=True)
+        WorkoutPlan.objects.filter(id=self.workout_plan.id).update(version=F('version') + 1)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(all(week['finished'] for week in response.data['data']))
+
+class IdempotencyKeyTests(TestCase):
+
+    def setUp(self):
+        identity_cache.clear()
+        user = User.objects.create(username='tester')
+        self.person = Person.objects.create(user=user, hashed_id='tester-hash', gender='male', height=1.8, weight=75)
+        self.client = APIClient()
+
+    def create_plan(self, key, preferred_days=('Monday',)):
+        body = {'X-User-Id': self.person.hashed_id, 'preferredDays': list(preferred_days)}
+        return self.client.post('/api/workout-plans/create/', body, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_the_response_without_creating_another_plan(self):
+        first = self.create_plan('retry-key')
+        second = self.create_plan('retry-key')
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(WorkoutPlan.objects.filter(person=self.person).count(), 1)
+
+    def test_key_cannot_be_reused_for_a_different_request(self):
+        self.create_plan('reused-key')
+
+        response = self.create_plan('reused-key', preferred_days=('Tuesday',))
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(WorkoutPlan.objects.filter(person=self.person).count(), 1)
+
+    def test_duplicate_of_a_running_request_is_refused(self):
+        first = self.create_plan('running-key')
+        IdempotencyKey.objects.filter(key='running-key').update(status_code=None, response_body='')
+
+        response = self.create_plan('running-key')
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(WorkoutPlan.objects.filter(person=self.person).count(), 1)
+
+    def test_retried_cohort_is_replayed(self):
+        User.objects.filter(id=self.person.user_id).update(is_staff=True)
+        body = {'X-User-Id': self.person.hashed_id, 'members': [{'hashedId': self.person.hashed_id, 'preferredDays': ['Monday']}]}
+
+        first = self.client.post('/api/workout-plans/cohort/', body, format='json', HTTP_IDEMPOTENCY_KEY='cohort-key')
+        second = self.client.post('/api/workout-plans/cohort/', body, format='json', HTTP_IDEMPOTENCY_KEY='cohort-key')
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(WorkoutPlan.objects.filter(person=self.person).count(), 1)
+
+    def test_person_is_dropped_from_the_identity_cache_once_committed(self):
+        identity_cache.get(self.person.hashed_id)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.put('/api/user/gender/', {'X-User-Id': self.person.hashed_id, 'gender': 'female'}, format='json', HTTP_IDEMPOTENCY_KEY='gender-key')
+            self.assertEqual(identity_cache.get(self.person.hashed_id).gender, 'male')
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(identity_cache.get(self.person.hashed_id).gender, 'female')
+
+class MessagePackRendererTests(TestCase):
+
+    def setUp(self):
+        identity_cache.clear()
+        user = User.objects.create(username='tester')
+        self.person = Person.objects.create(user=user, hashed_id='tester-hash', gender='male', height=1.8, weight=75)
+        self.client = APIClient()
+        Workout().generate_workout_plan(self.person, ['Monday'])
+
+    def test_msgpack_decodes_to_the_json_document(self):
+        url = f'/api/workout-plans/list/{self.person.hashed_id}/'
+        json_response = self.client.get(url, HTTP_ACCEPT='application/json')
+        msgpack_response = self.client.get(url, HTTP_ACCEPT='application/msgpack')
+
+        self.assertEqual(msgpack_response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(msgpack_response.content), json.loads(json_response.content))
+
+    def test_datetimes_are_encoded_as_iso_8601(self):
+        value = datetime(2024, 1, 1, 10, 0, tzinfo=dt_timezone.utc)
+
+        content = MessagePackRenderer().render({'date_created': value})
+
+        self.assertEqual(msgpack.unpackb(content), {'date_created': '2024-01-01T10:00:00Z'})
+
+class AsyncAuthenticationTests(TestCase):
+
+    def setUp(self):
+        identity_cache.clear()
+
+    def saturate_password_hasher(self):
+        slots = password_hasher.max_workers + password_hasher.max_queue
+        for _ in range(slots):
+            password_hasher._slots.acquire()
+        self.addCleanup(lambda: [password_hasher._slots.release() for _ in range(slots)])
+
+    def test_registered_user_can_log_in(self):
+        registered = self.client.post('/api/user/create/async/', {'username': 'tester', 'password': 'secret-password'}, content_type='application/json')
+        response = self.client.post('/api/user/login/async/', {'username': 'tester', 'password': 'secret-password'}, content_type='application/json')
+
+        self.assertEqual(registered.status_code, 201)
+        self.assertEqual(response.status_code, 200)
+        person = Person.objects.get(user__username='tester')
+        self.assertEqual(response.json()['userHashedId'], person.hashed_id)
+        self.assertFalse(response.json()['hasWorkoutPlans'])
+
+    def test_wrong_password_and_unknown_user_are_refused(self):
+        user = User.objects.create_user(username='tester', password='secret-password')
+        Person.objects.create(user=user, hashed_id='tester-hash', gender='male', height=1.8, weight=75)
+
+        wrong_password = self.client.post('/api/user/login/async/', {'username': 'tester', 'password': 'wrong'}, content_type='application/json')
+        unknown_user = self.client.post('/api/user/login/async/', {'username': 'nobody', 'password': 'secret-password'}, content_type='application/json')
+
+        self.assertEqual(wrong_password.status_code, 400)
+        self.assertEqual(unknown_user.status_code, 400)
+
+    @override_settings(PASSWORD_HASHERS=[
+        'django.contrib.auth.hashers.BCryptSHA256PasswordHasher', 'django.contrib.auth.hashers.MD5PasswordHasher'])
+    def test_outdated_hash_is_upgraded_outside_the_hashing_pool(self):
+        user = User.objects.create(username='tester', password=make_password('secret-password', hasher='md5'))
+        Person.objects.create(user=user, hashed_id='tester-hash', gender='male', height=1.8, weight=75)
+
+        saving_threads = []
+        original_save = User.save
+        def save(user, *args, **kwargs):
+            saving_threads.append(threading.current_thread().name)
+            return original_save(user, *args, **kwargs)
+
+        with mock.patch.object(User, 'save', save):
+            response = self.client.post('/api/user/login/async/', {'username': 'tester', 'password': 'secret-password'}, content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('bcrypt_sha256$'))
+        self.assertTrue(user.check_password('secret-password'))
+        self.assertEqual(len(saving_threads), 1)
+        self.assertFalse(saving_threads[0].startswith('password-hashing'))
+
+    def test_saturated_hasher_answers_503(self):
+        self.saturate_password_hasher()
+
+        registered = self.client.post('/api/user/create/async/', {'username': 'tester', 'password': 'secret-password'}, content_type='application/json')
+        logged_in = self.client.post('/api/user/login/async/', {'username': 'tester', 'password': 'secret-password'}, content_type='application/json')
+
+        self.assertEqual(registered.status_code, 503)
+        self.assertEqual(registered['Retry-After'], '1')
+        self.assertEqual(logged_in.status_code, 503)
+        self.assertFalse(User.objects.filter(username='tester').exists())
+
+class CompressionMiddlewareTests(TestCase):
+
+    async def test_async_responses_are_compressed_without_leaving_async_mode(self):
+        async def get_response(request):
+            return HttpResponse(b'exercise ' * 1000)
+
+        middleware = CompressionMiddleware(get_response)
+        response = await middleware(RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip'))
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), b'exercise ' * 1000)
+
+class PlanNumberingStressTests(TransactionTestCase):
+    # Generates plans from many threads at once. SQLite admits one writer at a time, so the interleavings that
+    # produced duplicate numbers only show up on a database with row level locking such as PostgreSQL, where a
+    # duplicate would also be rejected by the unique (person, number) constraint and reported as an error here.
+
+    THREADS = 8
+    PLANS_PER_THREAD = 3
+
+    def generate_concurrently(self, persons):
+        numbers, errors = [], []
+        barrier = threading.Barrier(self.THREADS)
+
+        def generate(person):
+            try:
+                barrier.wait()
+                for _ in range(self.PLANS_PER_THREAD):
+                    for attempt in range(200):
+                        try:
+                            workout_plan = Workout().generate_workout_plan(person, ['Monday'])
+                            break
+                        except OperationalError:
+                            # SQLite lets a single writer in at a time, the other threads retry
+                            time.sleep(0.005)
+                    else:
+                        raise AssertionError('The database stayed locked')
+                    numbers.append((person.id, workout_plan.number))
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=generate, args=(persons[index % len(persons)],)) for index in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        return numbers
+
+    def create_person(self, name):
+        user = User.objects.create(username=name)
+        return Person.objects.create(user=user, hashed_id=f'{name}-hash', gender='male', height=1.8, weight=75)
+
+    def test_concurrent_generations_get_consecutive_numbers(self):
+        person = self.create_person('tester')
+
+        numbers = self.generate_concurrently([person])
+
+        expected = list(range(1, self.THREADS * self.PLANS_PER_THREAD + 1))
+        self.assertEqual(sorted(number for person_id, number in numbers), expected)
+        self.assertEqual(sorted(WorkoutPlan.objects.filter(person=person).values_list('number', flat=True)), expected)
+
+    def test_numbers_are_counted_per_person(self):
+        persons = [self.create_person('first'), self.create_person('second')]
+        WorkoutPlan.objects.create(person=persons[1], name='1/4 CHALLENGE', number=1)
+
+        self.generate_concurrently(persons)
+
+        plans_per_person = self.THREADS // len(persons) * self.PLANS_PER_THREAD
+        self.assertEqual(sorted(WorkoutPlan.objects.filter(person=persons[0]).values_list('number', flat=True)), list(range(1, plans_per_person + 1)))
+        self.assertEqual(sorted(WorkoutPlan.objects.filter(person=persons[1]).values_list('number', flat=True)), list(range(1, plans_per_person + 2)))
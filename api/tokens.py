@@ -0,0 +1,43 @@
+"""
+Signed, expiring access tokens validated in memory.
+
+A token is the hashed id of a person signed with `TimestampSigner`, so checking it needs no database or session
+access. Tokens are signed with the first key of `ACCESS_TOKEN_KEYS` and accepted with any of them, which lets keys
+be rotated by prepending a new one and dropping the oldest once its tokens have expired.
+"""
+from django.conf import settings
+from django.core import signing
+
+TOKEN_SALT = 'api.access-token'
+TOKEN_SEP = ':'
+
+def _signer():
+    keys = getattr(settings, 'ACCESS_TOKEN_KEYS', None) or [settings.SECRET_KEY]
+    return signing.TimestampSigner(key=keys[0], fallback_keys=keys[1:], sep=TOKEN_SEP, salt=TOKEN_SALT)
+
+def is_access_token(value):
+    """
+    Returns True if the value looks like an access token rather than a hashed id.
+    """
+    return TOKEN_SEP in value
+
+def issue_access_token(person):
+    """
+    Returns a new access token for the person.
+    """
+    return _signer().sign(person.hashed_id)
+
+def read_access_token(token):
+    """
+    Returns the hashed id an access token was issued for.
+
+    Args:
+        token (str): The access token.
+
+    Returns:
+        str: The hashed id, None if the token was tampered with, signed with an unknown key or has expired.
+    """
+    try:
+        return _signer().unsign(token, max_age=settings.ACCESS_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return None
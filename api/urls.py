@@ -1,20 +1,33 @@
 from django.urls import path, include
-from . import views
+from . import async_views, views
 
 urlpatterns = [
     path('user/create/', views.UserCreateView),
     path('user/login/', views.UserLoginView),
     path('user/logout/', views.UserLogoutView),
+
+    # async versions of registration and login, hashing passwords off the request thread
+    path('user/create/async/', async_views.async_user_create),
+    path('user/login/async/', async_views.async_user_login),
+
     path('user/gender/', views.updateGender),
     path('user/biometrics/', views.updateUserBiometrics),
 
     path('workout-plans/create/', views.create_workout_plan),
+    path('workout-plans/jobs/<uuid:job_id>/', views.workout_plan_job_status),
+    path('workout-plans/cohort/', views.create_cohort_workout_plans),
     path('exercise/finish/', views.finish_exercise),
     path('workout-plans/finish/', views.finish_workout_plan),
 
     # get all workout plans
     path('workout-plans/list/<str:hashed_id>/', views.list_user_workout_plans),
     
+    # get a workout plan with all of its weeks, days, exercises and steps
+    path('workout-plans/<int:workout_id>/<str:hashed_id>/tree/', views.workout_plan_tree),
+
+    # get the stored JSON snapshot of a workout plan, the same document as the tree
+    path('workout-plans/<int:workout_id>/<str:hashed_id>/snapshot/', views.workout_plan_snapshot),
+
     # get all weeks of a workout plan
     path('workout-plans/<int:workout_id>/<str:hashed_id>/week/list/', views.list_workout_weeks),
 
@@ -24,7 +37,19 @@ urlpatterns = [
     # get all exercises of a day
     path('workout-plans/week/day/<int:day_id>/<str:hashed_id>/exercises/list/', views.list_workout_exercises),
 
+    # get all steps of an exercise
+    path('workout-plans/week/day/exercise/<int:exercise_id>/<str:hashed_id>/steps/list/', views.list_workout_exercise_steps),
+
+    # get all exercises a workout plan can be generated with
+    path('exercises/catalog/', views.list_exercise_catalog),
+
     # updates the sets and reps of an exercises
     path('exercise/sets/', views.update_sets),
-    path('exercise/reps/', views.update_reps)
+    path('exercise/reps/', views.update_reps),
+
+    # finishes and updates the sets and reps of many exercises at once
+    path('exercise/batch/', views.update_exercises_batch),
+
+    # replays the operation log of an offline client and returns what changed since its last sync
+    path('sync/', views.sync_workout_progress)
 ]
@@ -1,22 +1,43 @@
-from django.contrib.auth import authenticate, login, logout
+from django.conf import settings
+from django.contrib.auth import authenticate
 from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import F
+from django.http import HttpResponse
 from rest_framework import permissions, status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
-from .models import Exercise, ExerciseSteps, Person, WorkoutPlan, Day, Week, WorkoutPlan
-from .serializers import DaySerializer, ExerciseSerializer, ExerciseStepsSerializer, UserSerializer, WeekSerializer, WorkoutPlanSerializer
+from .models import Exercise, ExerciseSteps, Person, PlanGenerationJob, WorkoutPlan, Day, Week, WorkoutPlan
+from .serializers import DAY_FIELDS, EXERCISE_FIELDS, WEEK_FIELDS, UserSerializer, WeekSerializer, WorkoutPlanSerializer, WorkoutPlanTreeSerializer, lean_rows, prefetch_plan_tree
+from .authentication import get_hashed_id, identity_cache
+from .catalog import EXERCISES
+from .etags import is_not_modified, make_etag, not_modified_response
+from .idempotency import idempotent
+from .cohort import generate_cohort_plans
+from .jobs import INTERRUPTED_ERROR, is_stale, queue_workout_plan
+from .operations import apply_exercise_operations, validate_exercise_operations, write_exercise
+from .pagination import WorkoutPlanCursorPagination
+from .response_cache import plan_responses
+from .snapshots import patch_plan_snapshot, read_plan_snapshot
+from .sync import next_change_seq, read_changes
+from .tokens import issue_access_token
 from .utils import Workout
+from functools import wraps
 import hashlib
+import json
 
 def authenticate_user(view_func):
+    """
+    Rejects requests whose person could not be resolved by `HashedIdAuthentication`.
+    """
+    @wraps(view_func)
     def wrapper(request, *args, **kwargs):
 
-        hashed_id = request.data.get('X-User-Id')
-        if not hashed_id:
+        if not get_hashed_id(request):
             return Response({'error': 'User was not provided'}, status=status.HTTP_400_BAD_REQUEST)
 
-        person = Person.objects.filter(hashed_id=hashed_id).first()
-        if not person.user or not person:
+        person = getattr(request, 'person', None)
+        if not person:
             return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
 
         if not person.user.is_authenticated:
@@ -28,6 +49,12 @@ def authenticate_user(view_func):
 
 # -----------------------------------Route for login and registration-------------------------------
 
+def create_person(user):
+    """
+    Creates the Person extending a newly registered user.
+    """
+    return Person.objects.create(hashed_id=hashlib.sha256(str(user.id).encode()).hexdigest(), user=user, gender="", height=0, weight=0)
+
 @api_view(['POST'])
 def UserCreateView(request):
     serializer = UserSerializer(data=request.data)
@@ -39,9 +66,7 @@ def UserCreateView(request):
             return Response({'error': 'Password not provided'}, status=status.HTTP_400_BAD_REQUEST)
 
         user = serializer.save(password=make_password(password))
-        user.save()
-
-        Person.objects.create(hashed_id=hashlib.sha256(str(user.id).encode()).hexdigest(), user=user, gender="", height=0, weight=0)
+        create_person(user)
         
         return Response({'success': True}, status=status.HTTP_201_CREATED)
 
@@ -63,8 +88,15 @@ def UserLoginView(request):
     if user is not None:
         has_workout_plans = WorkoutPlan.objects.filter(person=user.person.id).exists()
         hashed_id = user.person.hashed_id
-        login(request, user)
-        return Response({'success': True, 'userHashedId': hashed_id, 'hasWorkoutPlans' : has_workout_plans}, status=status.HTTP_200_OK)
+        # the signed access token replaces the session, nothing is written to the session table
+        access_token = issue_access_token(user.person)
+        return Response({
+            'success': True,
+            'userHashedId': hashed_id,
+            'accessToken': access_token,
+            'accessTokenExpiresIn': settings.ACCESS_TOKEN_MAX_AGE,
+            'hasWorkoutPlans' : has_workout_plans,
+        }, status=status.HTTP_200_OK)
     else:
         return Response({'error': ['Invalid username or password', 'Registration needed']}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -72,13 +104,11 @@ def UserLoginView(request):
 @authenticate_user
 def UserLogoutView(request):
     
-    hashed_id = request.data.get('X-User-Id')
-    person = Person.objects.filter(hashed_id=hashed_id).first()
-
-    user = person.user
+    user = request.person.user
 
     if user:
-        logout(request)
+        # there is no session to end, the client discards its access token
+        identity_cache.invalidate(request.person.hashed_id)
         return Response({'success': 'User logged out successfully.'}, status=200)
     
     return Response({'error': 'User not found or not logged in.'}, status=404)
@@ -87,11 +117,10 @@ def UserLogoutView(request):
 
 @api_view(["PUT"])
 @authenticate_user
+@idempotent
 def updateGender(request):
 
-    hashed_id = request.data.get('X-User-Id')
-
-    person = Person.objects.filter(hashed_id=hashed_id).first()
+    person = request.person
 
     gender = request.data.get('gender', None)
     if gender is None:
@@ -99,16 +128,17 @@ def updateGender(request):
     
     person.gender = gender
     person.save()
+    # dropped once the change is committed, a request resolving the person before that would cache the old values
+    transaction.on_commit(lambda: identity_cache.invalidate(person.hashed_id))
 
     return Response({'success': True}, status=status.HTTP_200_OK)
 
 @api_view(["PUT"])
 @authenticate_user
+@idempotent
 def updateUserBiometrics(request):
 
-    hashed_id = request.data.get('X-User-Id')
-
-    person = Person.objects.filter(hashed_id=hashed_id).first()
+    person = request.person
 
     height = request.data.get('userHeight', None)
     if height is None:
@@ -121,6 +151,8 @@ def updateUserBiometrics(request):
     person.height = height
     person.weight = weight
     person.save()
+    # dropped once the change is committed, a request resolving the person before that would cache the old values
+    transaction.on_commit(lambda: identity_cache.invalidate(person.hashed_id))
 
     return Response({'success': True}, status=status.HTTP_200_OK)
 
@@ -128,186 +160,322 @@ def updateUserBiometrics(request):
 
 @api_view(['POST'])
 @authenticate_user
+@idempotent
 def create_workout_plan(request):
     """
     A view that creates a new workout plan for a user.
+    When 'asJob' is set, the plan is generated in the background and the id of the job is returned instead.
     """
-    hashed_id = request.data.get('X-User-Id')
-
-    person = Person.objects.filter(hashed_id=hashed_id).first()
+    person = request.person
+    # the identity cache of this process may still hold attributes the person changed through another process
+    person.refresh_from_db(fields=['gender', 'height', 'weight'])
 
     preferred_days = request.data.get('preferredDays', None)
     if preferred_days is None:
         return Response({'error': 'Preferred days are empty'}, status=status.HTTP_404_NOT_FOUND)
 
+    # generates the workout plan in the background, the client polls the job for its outcome
+    if request.data.get('asJob', False):
+        job = queue_workout_plan(person, preferred_days)
+        return Response({'success': 'Workout Plan generation queued', 'jobId': str(job.id)}, status=status.HTTP_202_ACCEPTED)
+
+    # generate_workout_plan returns a string describing why the plan could not be generated
     workout_plan_create = Workout().generate_workout_plan(person, preferred_days)
-    if not workout_plan_create:
+    if not isinstance(workout_plan_create, WorkoutPlan):
         return Response({'error': 'Workout Plan Not Created'}, status=status.HTTP_404_NOT_FOUND)
 
     return Response({'success': 'New Workout Plan created'}, status=status.HTTP_201_CREATED)
 
 
+@api_view(['POST'])
+@authenticate_user
+@idempotent(atomic=False)
+def create_cohort_workout_plans(request):
+    """
+    A view that creates a workout plan for every member of a cohort, for staff members only.
+    The plans are generated within the request, so a request holds at most COHORT_REQUEST_MAX_MEMBERS members,
+    larger cohorts are generated with the generate_cohort_plans management command.
+    """
+    person = request.person
+    if not person.user.is_staff:
+        return Response({'error': 'User is not allowed to create cohort plans'}, status=status.HTTP_403_FORBIDDEN)
+
+    members = request.data.get('members', None)
+    if not members or not isinstance(members, list):
+        return Response({'error': 'Members are empty'}, status=status.HTTP_400_BAD_REQUEST)
+
+    max_members = getattr(settings, 'COHORT_REQUEST_MAX_MEMBERS', 200)
+    if len(members) > max_members:
+        return Response({
+            'error': f'At most {max_members} members are allowed at once, use the generate_cohort_plans command for larger cohorts'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        entries = [(member['hashedId'], member['preferredDays']) for member in members]
+    except (KeyError, TypeError):
+        return Response({'error': 'Every member needs a hashedId and preferredDays'}, status=status.HTTP_400_BAD_REQUEST)
+
+    reports = generate_cohort_plans(entries)
+    return Response({'data': reports}, status=status.HTTP_200_OK)
+
+@api_view(['GET'])
+def workout_plan_job_status(request, job_id):
+    """
+    A view that reports the state of a queued workout plan generation
+    """
+    job = PlanGenerationJob.objects.filter(id=job_id).first()
+    if not job:
+        return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    if is_stale(job):
+        return Response({'status': PlanGenerationJob.FAILED, 'workoutPlanId': None, 'error': INTERRUPTED_ERROR}, status=status.HTTP_200_OK)
+
+    return Response({
+        'status': job.status,
+        'workoutPlanId': job.workout_plan_id,
+        'error': job.error,
+    }, status=status.HTTP_200_OK)
+
 @api_view(['GET'])
+@authenticate_user
 def list_user_workout_plans(request, hashed_id):
     """
-    A view that lists all workout plans for a user.
+    A view that lists the workout plans of a user, one page at a time, oldest first.
+    The 'cursor' and 'pageSize' query parameters select the page and 'fields' a comma separated subset of the plan
+    fields.
+    Answers 304 when the If-None-Match header holds the ETag of the versions of the page's plans and of its links.
     """
-    person = Person.objects.filter(hashed_id=hashed_id).first()
-    if not person:
-        return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
+    person = request.person
 
-    if not person.user.is_authenticated:
-        return Response({'error': 'User not logged in'}, status=status.HTTP_401_UNAUTHORIZED)
+    fields = None
+    if request.query_params.get('fields'):
+        fields = [field.strip() for field in request.query_params['fields'].split(',') if field.strip()]
+        unknown_fields = set(fields) - set(WorkoutPlanSerializer().fields)
+        if unknown_fields:
+            return Response({'error': f"Unknown fields: {', '.join(sorted(unknown_fields))}"}, status=status.HTTP_400_BAD_REQUEST)
 
     workout_plans = WorkoutPlan.objects.filter(person=person)
-    if not workout_plans:
+    if fields is not None:
+        # only the requested columns, plus those the ordering and the ETag need
+        columns = [field for field in fields if field in {model_field.name for model_field in WorkoutPlan._meta.concrete_fields}]
+        workout_plans = workout_plans.only('id', 'date_created', 'version', *columns)
+
+    paginator = WorkoutPlanCursorPagination()
+    page = paginator.paginate_queryset(workout_plans, request)
+    if not page and not request.query_params.get(paginator.cursor_query_param):
         return Response({'error': 'Workout plans not found'}, status=status.HTTP_404_NOT_FOUND)
 
-    serializer = WorkoutPlanSerializer(workout_plans, many=True)
+    workouts_completed = not WorkoutPlan.objects.filter(person=person, finished=False).exists()
+    # a plan created after a full last page adds a next link without changing the plans of the page
+    next_link, previous_link = paginator.get_next_link(), paginator.get_previous_link()
+
+    etag = make_etag(request, 'plans', person.id, person.gender, workouts_completed, next_link, previous_link,
+                     [(workout_plan.id, workout_plan.version) for workout_plan in page])
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+
+    serializer = WorkoutPlanSerializer(page, many=True, fields=fields)
 
     return Response({
         'data': serializer.data,
         'gender': person.gender,
-        'workouts_completed': all(workout_plan.finished for workout_plan in workout_plans),
-    }, status=status.HTTP_200_OK)
+        'workouts_completed': workouts_completed,
+        'next': next_link,
+        'previous': previous_link,
+    }, status=status.HTTP_200_OK, headers={'ETag': etag})
+
+@api_view(['GET'])
+@authenticate_user
+def workout_plan_tree(request, workout_id, hashed_id):
+    """
+    A view that returns a workout plan with all of its weeks, days, exercises and steps
+    """
+    person = request.person
+
+    workout = prefetch_plan_tree(WorkoutPlan.objects.filter(id=workout_id, person=person)).first()
+    if not workout:
+        return Response({'error': 'Workout plan not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    serializer = WorkoutPlanTreeSerializer(workout)
+    return Response({'data' : serializer.data, 'gender' : person.gender}, status=status.HTTP_200_OK)
 
 @api_view(['GET'])
+@authenticate_user
+def workout_plan_snapshot(request, workout_id, hashed_id):
+    """
+    A view that returns the stored JSON snapshot of a workout plan, the same document as the tree view, without writing
+    Unlike the other views it always answers JSON, 'Accept: application/msgpack' is ignored
+    """
+    person = request.person
+
+    document = read_plan_snapshot(workout_id, person)
+    if document is None:
+        return Response({'error': 'Workout plan not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    # the document is embedded as is, it is never decoded
+    content = f'{{"data":{document},"gender":{json.dumps(person.gender)}}}'
+    return HttpResponse(content, content_type='application/json')
+
+@api_view(['GET'])
+@authenticate_user
 def list_workout_weeks(request, workout_id, hashed_id):
     """
     A view that lists all weeks related to a workout plan
+    Answers 304 when the If-None-Match header holds the ETag of the current plan version.
     """
-    person = Person.objects.filter(hashed_id=hashed_id).first()
-    if not person:
-        return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
-
-    if not person.user.is_authenticated:
-        return Response({'error': 'User not logged in'}, status=status.HTTP_401_UNAUTHORIZED)
+    person = request.person
 
     if not workout_id:
         return Response({'error': 'Workout not provided'}, status=status.HTTP_404_NOT_FOUND)
 
-    workout = WorkoutPlan.objects.filter(id=workout_id).first()
-    # starts workout when user accesses its weeks content
-    workout.started = True
-    workout.save()
+    workout = WorkoutPlan.objects.filter(id=workout_id).values_list('name', 'version').first()
+    if not workout:
+        return Response({'error': 'Workout plan not found'}, status=status.HTTP_404_NOT_FOUND)
 
-    workout_weeks = Week.objects.filter(workout_plan=workout_id)
-    if not workout_weeks:
-        return Response({'error': 'Workout weeks not found'}, status=status.HTTP_404_NOT_FOUND)
+    workout_name, version = workout
+    etag = make_etag(request, 'weeks', workout_id, version, person.gender)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
 
-    for week in workout_weeks:
-        if not week.finished:
-            break
-    else:
-        workout.finished = True
-        workout.save()
+    def build():
+        workout_weeks = lean_rows(Week.objects.filter(workout_plan=workout_id).order_by('id'), WEEK_FIELDS)
+        return {'data' : workout_weeks, 'workoutName' : workout_name} if workout_weeks else None
+
+    payload = plan_responses.get(f'weeks:{workout_id}', lambda: workout_id, build, version)
+    if not payload:
+        return Response({'error': 'Workout weeks not found'}, status=status.HTTP_404_NOT_FOUND)
 
-    serializer = WeekSerializer(workout_weeks, many=True)
-    return Response({'data' : serializer.data, 'gender' : person.gender, 'workoutName' : workout.name}, status=status.HTTP_200_OK)
+    return Response(dict(payload, gender=person.gender), status=status.HTTP_200_OK, headers={'ETag': etag})
 
 @api_view(['GET'])
+@authenticate_user
 def list_workout_days(request, week_id, hashed_id):
     """
     A view that lists all days related to workout week
+    Answers 304 when the If-None-Match header holds the ETag of the current version of the week's plan.
     """
-    person = Person.objects.filter(hashed_id=hashed_id).first()
-    if not person:
-        return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
-
-    if not person.user.is_authenticated:
-        return Response({'error': 'User not logged in'}, status=status.HTTP_401_UNAUTHORIZED)
+    person = request.person
 
     if not week_id:
         return Response({'error': 'Week not provided'}, status=status.HTTP_404_NOT_FOUND)
 
-    week = Week.objects.filter(id=week_id).first()
+    week = Week.objects.filter(id=week_id).annotate(plan_version=F('workout_plan__version')).first()
     if not week:
         return Response({'error': 'Week not found'}, status=status.HTTP_404_NOT_FOUND)
 
-    day = Day.objects.filter(week=week_id).order_by('number')
-    if not day:
-        return Response({'error': 'No day found for the given week'}, status=status.HTTP_404_NOT_FOUND)
+    etag = make_etag(request, 'days', week_id, week.plan_version, person.gender)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
 
-    for current_day in day:
-        if not current_day.finished:
-            break
-    else:
-        week.finished = True
-        if week.has_next():
-            week.set_next_as_current()
-        week.save()
+    def build():
+        days = lean_rows(Day.objects.filter(week=week_id).order_by('number'), DAY_FIELDS)
+        if not days:
+            return None
+
+        # the week is serialized once and shared by every day
+        week_data = WeekSerializer(week).data
+        for day in days:
+            day['week'] = week_data
 
-    serializer = DaySerializer(day, many=True)
-    return Response({'data' : serializer.data, 'gender' : person.gender }, status=status.HTTP_200_OK)
+        return {'data' : days}
+
+    payload = plan_responses.get(f'days:{week_id}', lambda: week.workout_plan_id, build, week.plan_version)
+    if not payload:
+        return Response({'error': 'No day found for the given week'}, status=status.HTTP_404_NOT_FOUND)
+
+    return Response(dict(payload, gender=person.gender), status=status.HTTP_200_OK, headers={'ETag': etag})
 
 
 @api_view(['GET'])
+@authenticate_user
 def list_workout_exercises(request, day_id, hashed_id):
     """
     A view that lists all exercises related to workout day
     """
-    person = Person.objects.filter(hashed_id=hashed_id).first()
-    if not person:
-        return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
-
-    if not person.user.is_authenticated:
-        return Response({'error': 'User not logged in'}, status=status.HTTP_401_UNAUTHORIZED)
+    person = request.person
 
     if not day_id:
         return Response({'error': 'Day not provided'}, status=status.HTTP_404_NOT_FOUND)
 
-    day = Day.objects.filter(id=day_id).first()
-    exercises = Exercise.objects.filter(day=day_id)
-    if not exercises:
-        return Response({'error': 'No exercise found for the given day'}, status=status.HTTP_404_NOT_FOUND)
+    def build():
+        # the workout plan is read along with the exercises, it scopes the cache entry
+        exercise_list = lean_rows(Exercise.objects.filter(day=day_id).order_by('id'), EXERCISE_FIELDS + ('definition', 'day__name', 'day__week__workout_plan'))
+        if not exercise_list:
+            return None
+
+        steps = {}
+        definition_ids = {exercise['definition'] for exercise in exercise_list}
+        for definition_id, instruction in ExerciseSteps.objects.filter(definition__in=definition_ids).order_by('id').values_list('definition', 'instruction'):
+            steps.setdefault(definition_id, []).append(instruction)
 
-    exercise_list = []
-    for exercise in exercises:
-        exercise_data = ExerciseSerializer(exercise).data
-        steps = ExerciseSteps.objects.filter(exercise=exercise)
-        if steps:
-            exercise_data['steps'] = [step.instruction for step in steps]
-        else:
-            exercise_data['steps'] = []
-        exercise_list.append(exercise_data)
+        for exercise in exercise_list:
+            day_name = exercise.pop('day__name')
+            workout_plan_id = exercise.pop('day__week__workout_plan')
+            exercise['steps'] = steps.get(exercise.pop('definition'), [])
 
-    return Response({'data' : exercise_list, 'gender' : person.gender, 'dayName' : day.name}, status=status.HTTP_200_OK)
+        return workout_plan_id, {'data' : exercise_list, 'dayName' : day_name}
+
+    payload = plan_responses.get(f'exercises:{day_id}', None, build)
+    if not payload:
+        return Response({'error': 'No exercise found for the given day'}, status=status.HTTP_404_NOT_FOUND)
+
+    return Response(dict(payload, gender=person.gender), status=status.HTTP_200_OK)
 
 @api_view(['GET'])
+@authenticate_user
 def list_workout_exercise_steps(request, exercise_id, hashed_id):
     """
     A view that lists all exercises_step related to an exercise
     """
-    person = Person.objects.filter(hashed_id=hashed_id).first()
-    if not person:
-        return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
-
-    if not person.user.is_authenticated:
-        return Response({'error': 'User not logged in'}, status=status.HTTP_401_UNAUTHORIZED)
-
     if not exercise_id:
         return Response({'error': 'Exercise not provided'}, status=status.HTTP_404_NOT_FOUND)
 
-    exercise_steps = ExerciseSteps.objects.filter(exercise=exercise_id)
-    if not exercise_steps:
+    def build():
+        exercise_steps = lean_rows(ExerciseSteps.objects.filter(definition__exercise=exercise_id).order_by('id'), ('id', 'instruction'))
+        for step in exercise_steps:
+            step['exercise'] = exercise_id
+
+        return {'data' : exercise_steps} if exercise_steps else None
+
+    resolve = lambda: Exercise.objects.filter(id=exercise_id).values_list('day__week__workout_plan', flat=True).first()
+    payload = plan_responses.get(f'steps:{exercise_id}', resolve, build)
+    if not payload:
         return Response({'error': 'No steps found for the given exercise'}, status=status.HTTP_404_NOT_FOUND)
 
-    serializer = ExerciseStepsSerializer(exercise_steps, many=True)
-    return Response({'data' : serializer.data}, status=status.HTTP_200_OK)
+    return Response(payload, status=status.HTTP_200_OK)
+
+@api_view(['GET'])
+def list_exercise_catalog(request):
+    """
+    A view that lists every exercise a workout plan can be generated with
+    """
+    exercise_list = [exercise._asdict() for exercise in EXERCISES.values()]
+    return Response({'data' : exercise_list}, status=status.HTTP_200_OK)
 
 # -----------------------------Routes for updating reps and sets of an exercise-------------------
 
+def exercise_conflict_response(exercise_id):
+    """
+    Answers a write made against an outdated version of an exercise with its current version.
+    """
+    current_version = Exercise.objects.filter(id=exercise_id).values_list('version', flat=True).first()
+    return Response({'error': 'Exercise was changed by another request', 'version': current_version}, status=status.HTTP_409_CONFLICT)
+
 @api_view(['PUT'])
 @authenticate_user
+@idempotent
 def update_reps(request):
     """
     A view that updates the reps for an exercise.
+    The optional 'version' is the version of the exercise the change was made against, the write is refused with
+    409 if the exercise has changed since.
     """
     exercise_id = request.data.get("exercise_id")
     if not exercise_id:
         return Response({'error': 'Exercise was not provided'}, status=status.HTTP_404_NOT_FOUND)
 
-    exercise = Exercise.objects.filter(id=exercise_id).first()
+    exercise = Exercise.objects.filter(id=exercise_id).annotate(
+        workout_plan_id=F('day__week__workout_plan'), person_id=F('day__week__workout_plan__person')).first()
     if not exercise:
         return Response({'error': 'Exercise does not exist'}, status=status.HTTP_404_NOT_FOUND)
 
@@ -315,22 +483,33 @@ def update_reps(request):
     if not reps:
         return Response({'error': 'Reps not provided'}, status=status.HTTP_400_BAD_REQUEST)
 
-    exercise.reps = reps
-    exercise.save()
+    version = request.data.get('version', exercise.version)
+    if not isinstance(version, int):
+        return Response({'error': 'Version must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+
+    with transaction.atomic():
+        new_version = write_exercise(exercise, version, reps=reps)
 
-    return Response({'success': 'Reps updated'}, status=status.HTTP_200_OK)
+    if new_version is None:
+        return exercise_conflict_response(exercise.id)
+
+    return Response({'success': 'Reps updated', 'version': new_version}, status=status.HTTP_200_OK)
 
 @api_view(['PUT'])
 @authenticate_user
+@idempotent
 def update_sets(request):
     """
     A view that updates the sets for an exercise.
+    The optional 'version' is the version of the exercise the change was made against, the write is refused with
+    409 if the exercise has changed since.
     """
     exercise_id = request.data.get("exercise_id")
     if not exercise_id:
         return Response({'error': 'Exercise was not provided'}, status=status.HTTP_404_NOT_FOUND)
 
-    exercise = Exercise.objects.filter(id=exercise_id).first()
+    exercise = Exercise.objects.filter(id=exercise_id).annotate(
+        workout_plan_id=F('day__week__workout_plan'), person_id=F('day__week__workout_plan__person')).first()
     if not exercise:
         return Response({'error': 'Exercise does not exist'}, status=status.HTTP_404_NOT_FOUND)
 
@@ -339,45 +518,123 @@ def update_sets(request):
     if not sets:
         return Response({'error': 'Sets not provided'}, status=status.HTTP_400_BAD_REQUEST)
 
-    exercise.sets = sets
-    exercise.save()
+    version = request.data.get('version', exercise.version)
+    if not isinstance(version, int):
+        return Response({'error': 'Version must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+
+    with transaction.atomic():
+        new_version = write_exercise(exercise, version, sets=sets)
+
+    if new_version is None:
+        return exercise_conflict_response(exercise.id)
 
-    return Response({'success': 'Sets updated'}, status=status.HTTP_200_OK)
+    return Response({'success': 'Sets updated', 'version': new_version}, status=status.HTTP_200_OK)
+
+@api_view(['PUT'])
+@authenticate_user
+@idempotent
+def update_exercises_batch(request):
+    """
+    A view that applies a list of operations to exercises of the user in one transaction.
+    Every operation is a {'exercise_id', 'action', 'value'} object, the action being 'finish', 'reps' or 'sets'
+    and the value the new reps or sets. Either every operation is applied or none is.
+    """
+    person = request.person
+
+    operations = request.data.get('operations', None)
+    if not operations:
+        return Response({'error': 'Operations were not provided'}, status=status.HTTP_400_BAD_REQUEST)
+
+    invalid = validate_exercise_operations(operations)
+    if invalid:
+        return Response({'error': invalid}, status=status.HTTP_400_BAD_REQUEST)
+
+    with transaction.atomic():
+        updated, missing_ids, conflicting_ids = apply_exercise_operations(person, operations)
+
+    if missing_ids:
+        return Response({'error': 'Exercise does not exist', 'exerciseIds': missing_ids}, status=status.HTTP_404_NOT_FOUND)
+
+    if conflicting_ids:
+        return Response({'error': 'Exercise was changed by another request', 'exerciseIds': conflicting_ids}, status=status.HTTP_409_CONFLICT)
+
+    return Response({'success': 'Exercises updated', 'updated': updated}, status=status.HTTP_200_OK)
+
+@api_view(['POST'])
+@authenticate_user
+@idempotent
+def sync_workout_progress(request):
+    """
+    A view that replays the operation log of an offline client and returns what changed since its cursor.
+    The log is applied in one transaction, in order, like `update_exercises_batch`. The returned cursor is sent
+    back with the next sync, a missing cursor returns every workout plan, week, day and exercise of the user.
+    """
+    person = request.person
+
+    cursor = request.data.get('cursor', None)
+    if cursor is not None and (not isinstance(cursor, int) or isinstance(cursor, bool) or cursor < 0):
+        return Response({'error': 'Cursor is invalid'}, status=status.HTTP_400_BAD_REQUEST)
+
+    operations = request.data.get('operations', [])
+    invalid = validate_exercise_operations(operations)
+    if invalid:
+        return Response({'error': invalid}, status=status.HTTP_400_BAD_REQUEST)
+
+    with transaction.atomic():
+        applied, missing_ids, conflicting_ids = apply_exercise_operations(person, operations)
+
+    if missing_ids:
+        return Response({'error': 'Exercise does not exist', 'exerciseIds': missing_ids}, status=status.HTTP_404_NOT_FOUND)
+
+    if conflicting_ids:
+        return Response({'error': 'Exercise was changed by another request', 'exerciseIds': conflicting_ids}, status=status.HTTP_409_CONFLICT)
+
+    return Response(dict(read_changes(person, cursor), applied=len(operations)), status=status.HTTP_200_OK)
 
 # -----------------------------Routes for setting finished status---------------------------------
 
 @api_view(['PUT'])
 @authenticate_user
+@idempotent
 def finish_exercise(request):
     """
-    A view that sets the 'finished' attribute of an exercise to True.
+    A view that sets the 'finished' attribute of an exercise to True and updates the progress of its day, week
+    and workout plan.
+    The optional 'version' is the version of the exercise the client last saw, the write is refused with 409 if the
+    exercise has changed since. Finishing a finished exercise does nothing.
     """
     exercise_id = request.data.get("exercise_id")
     if not exercise_id:
         return Response({'error': 'Exercise was not provided'}, status=status.HTTP_404_NOT_FOUND)
 
-    exercise = Exercise.objects.filter(id=exercise_id).first()
+    exercise = Exercise.objects.filter(id=exercise_id).annotate(
+        workout_plan_id=F('day__week__workout_plan'), person_id=F('day__week__workout_plan__person')).first()
     if not exercise:
         return Response({'error': 'Exercise does not exist'}, status=status.HTTP_404_NOT_FOUND)
 
-    exercise.finished = True
-    exercise.save()
+    version = request.data.get('version', exercise.version)
+    if not isinstance(version, int):
+        return Response({'error': 'Version must be a number'}, status=status.HTTP_400_BAD_REQUEST)
 
-    day = exercise.day
-    for exercise in day.exercise_set.all():
-        if not exercise.finished:
-            break
-    else:
-        day.finished = True
-        day.save()
+    if exercise.finished:
+        return Response({'success': 'Exercise completed', 'version': exercise.version}, status=status.HTTP_200_OK)
+
+    with transaction.atomic():
+        new_version = write_exercise(exercise, version, finished=True)
 
-    return Response({'success': 'Exercise completed'}, status=status.HTTP_200_OK)
+    if new_version is None:
+        return exercise_conflict_response(exercise.id)
+
+    return Response({'success': 'Exercise completed', 'version': new_version}, status=status.HTTP_200_OK)
 
 @api_view(['PUT'])
 @authenticate_user
+@idempotent
 def finish_workout_plan(request):
     """
     A view that sets the 'finished' attribute of a workout plan to True.
+    The optional 'version' is the version of the workout plan the client last saw, the write is refused with 409 if
+    the plan or anything in it has changed since.
     """
     workout_plan_id = request.data.get("workout_plan_id")
     if not workout_plan_id:
@@ -387,7 +644,19 @@ def finish_workout_plan(request):
     if not workout_plan:
         return Response({'error': 'Workout plan does not exist'}, status=status.HTTP_404_NOT_FOUND)
 
-    workout_plan.finished = True
-    workout_plan.save()
+    version = request.data.get('version', workout_plan.version)
+    if not isinstance(version, int):
+        return Response({'error': 'Version must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+
+    with transaction.atomic():
+        written = WorkoutPlan.objects.filter(id=workout_plan.id, version=version).update(
+            finished=True, version=F('version') + 1, change_seq=next_change_seq(workout_plan.person_id))
+        if written:
+            patch_plan_snapshot(workout_plan.id)
+            plan_responses.invalidate_on_commit([workout_plan.id])
+
+    if not written:
+        current_version = WorkoutPlan.objects.filter(id=workout_plan.id).values_list('version', flat=True).first()
+        return Response({'error': 'Workout plan was changed by another request', 'version': current_version}, status=status.HTTP_409_CONFLICT)
 
-    return Response({'success': 'Workout plan completed'}, status=status.HTTP_200_OK)
+    return Response({'success': 'Workout plan completed', 'version': version + 1}, status=status.HTTP_200_OK)
@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+from corsheaders.defaults import default_headers
+from importlib.util import find_spec
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -44,6 +46,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -54,6 +57,35 @@ MIDDLEWARE = [
 ]
 
 CORS_ORIGIN_ALLOW_ALL = True
+
+# retried mutating requests carry an Idempotency-Key header, see api.idempotency
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
+
+REST_FRAMEWORK = {
+    # resolves the person of the X-User-Id / hashed_id once per request, see api.authentication
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'api.authentication.HashedIdAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+        'rest_framework.authentication.BasicAuthentication',
+    ],
+    # JSON, and MessagePack for 'Accept: application/msgpack'. msgpack is pinned in requirements.txt, an install
+    # missing it only offers JSON
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ] + (['api.renderers.MessagePackRenderer'] if find_spec('msgpack') else []),
+}
+
+# Responses of at least MIN_SIZE bytes are compressed by api.middleware.CompressionMiddleware, with brotli when the
+# client accepts it and with gzip otherwise. Brotli is pinned in requirements.txt, an install missing it uses gzip
+
+RESPONSE_COMPRESSION = {
+    'MIN_SIZE': 1024,
+    'GZIP_LEVEL': 6,
+    'BROTLI': True,
+    'BROTLI_QUALITY': 5,
+}
+
 ROOT_URLCONF = 'backend.urls'
 
 TEMPLATES = [
@@ -129,6 +161,70 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 PASSWORD_HASHERS = [    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher']
 
+# Threads hashing passwords for the async login views and how many calls may wait for them, see api.hashing
+PASSWORD_HASHING_WORKERS = 4
+PASSWORD_HASHING_QUEUE = 16
+
 CORS_ALLOWED_ORIGINS = [
     'http://127.0.0.1:8000'
-] 
\ No newline at end of file
+]
+
+# Workout plan generation
+# Number of (preferred days, sets, reps, weeks) keys and skeleton variants per key kept by api.skeletons
+
+PLAN_SKELETON_CACHE_SIZE = 256
+PLAN_SKELETON_POOL_SIZE = 16
+
+# Number of threads running queued workout plan generations, see api.jobs
+
+PLAN_GENERATION_WORKERS = 2
+
+# Seconds after which a job still queued or running is reported as failed, its process having restarted since
+
+PLAN_GENERATION_TIMEOUT = 60 * 10
+
+# Number of members a cohort request may hold, larger cohorts are generated with the generate_cohort_plans command
+
+COHORT_REQUEST_MAX_MEMBERS = 200
+
+# Number of resolved persons kept by api.authentication.identity_cache and how many seconds they stay valid
+
+IDENTITY_CACHE_SIZE = 1024
+IDENTITY_CACHE_TTL = 300
+
+# Keys signing the access tokens issued at login, see api.tokens. The first key signs new tokens and every key is
+# accepted, so a key is rotated by prepending the new one and dropping the old one after ACCESS_TOKEN_MAX_AGE
+
+ACCESS_TOKEN_KEYS = [SECRET_KEY]
+ACCESS_TOKEN_MAX_AGE = 60 * 60 * 24 * 30
+
+# Whether requests must carry an access token, a bare hashed id is accepted until every client sends one
+
+ACCESS_TOKEN_REQUIRED = False
+
+# Responses of the week, day, exercise and exercise steps listings, see api.response_cache. LocMemCache is private to
+# each process: week and day listings are checked against the plan version and stay correct, but exercise and step
+# listings are only invalidated in the process that wrote the plan. With more than one worker process, switch the
+# 'plan-responses' backend to one they share, like django.core.cache.backends.filebased.FileBasedCache or a
+# Redis/Memcached backend
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'plan-responses': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'plan-responses',
+        'TIMEOUT': 60 * 60 * 24,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+PLAN_RESPONSE_CACHE = 'plan-responses'
+
+# Responses of mutating requests sent with an Idempotency-Key header are replayed for IDEMPOTENCY_KEY_TTL seconds,
+# see api.idempotency. A key whose request has not stored a response after IDEMPOTENCY_LOCK_TIMEOUT seconds can be
+# claimed again
+
+IDEMPOTENCY_KEY_TTL = 60 * 60 * 24
+IDEMPOTENCY_LOCK_TIMEOUT = 60 * 5